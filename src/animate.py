@@ -12,15 +12,13 @@ import h5py
 IN_COLAB = 'google.colab' in sys.modules
 if not IN_COLAB:
     from utils.viz import Ax3DPose
-    from utils.forward_kinematics import kinematic_tree_variables
-    from utils.forward_kinematics import revert_coordinate_space
-    from utils.forward_kinematics import fkl
+    from utils.forward_kinematics import revert_coordinate_space_batch
+    from utils.forward_kinematics import fkl_batch
     from parsers import animation_parser
 else:
     from src.utils.viz import Ax3DPose
-    from src.utils.forward_kinematics import kinematic_tree_variables
-    from src.utils.forward_kinematics import revert_coordinate_space
-    from src.utils.forward_kinematics import fkl
+    from src.utils.forward_kinematics import revert_coordinate_space_batch
+    from src.utils.forward_kinematics import fkl_batch
 
 
 def create_gif(input_dir, output_dir, filename='animation.gif'):
@@ -72,7 +70,6 @@ def animate(args):
     logging.basicConfig(format='%(levelname)s: %(message)s', level=20)
 
     # Load all the data
-    parent, offset, rot_ind, expmap_ind = kinematic_tree_variables()
     with h5py.File('samples.h5', 'r') as h5f:
         # Ground truth (exponential map)
         expmap_gt = h5f['expmap/gt/walking_{}'.format(args.sample_id)][:]
@@ -84,21 +81,14 @@ def animate(args):
     logging.info(f'{nframes_gt} {nframes_pred}')
 
     # Put them together and revert the coordinate space
-    expmap_all = revert_coordinate_space(np.vstack((expmap_gt, expmap_pred)),
-                                         np.eye(3), np.zeros(3))
+    expmap_all = revert_coordinate_space_batch(
+        np.vstack((expmap_gt, expmap_pred)), np.eye(3), np.zeros(3))
     expmap_gt = expmap_all[:nframes_gt, :]
     expmap_pred = expmap_all[nframes_gt:, :]
 
     # Use forward kinematics to compute 33 3d points for each frame
-    xyz_gt, xyz_pred = np.zeros((nframes_gt, 96)), np.zeros((nframes_pred, 96))
-
-    for i in range(nframes_gt):
-        xyz_gt[i, :] = fkl(expmap_gt[i, :], parent, offset, rot_ind,
-                           expmap_ind)
-
-    for i in range(nframes_pred):
-        xyz_pred[i, :] = fkl(expmap_pred[i, :], parent, offset, rot_ind,
-                             expmap_ind)
+    xyz_gt = fkl_batch(expmap_gt)
+    xyz_pred = fkl_batch(expmap_pred)
 
     # === Plot and animate ===
     fig = plt.figure()
@@ -0,0 +1,140 @@
+"""Micro-benchmark of the decoder of the motion prediction model."""
+
+import logging
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.profiler import profile
+from torch.profiler import ProfilerActivity
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import benchmark_parser
+    from models.motionpredictor import MotionPredictor
+else:
+    from src.models.motionpredictor import MotionPredictor
+
+
+def decode_concat(model, decoder_inputs, state):
+    """Reference decoder, collecting time-major outputs in a list that is
+    concatenated and transposed at the end.
+
+    Parameters
+    ----------
+    model: MotionPredictor
+        Model whose cell and output layer to use.
+    decoder_inputs : torch.Tensor
+        (batch_size, target_seq_len, input_size) input to the decoder.
+    state : torch.Tensor
+        (batch_size, rnn_size) state of the encoder.
+
+    Returns
+    -------
+    outputs : torch.Tensor
+        (batch_size, target_seq_len, input_size) predictions.
+    """
+
+    batch_size = decoder_inputs.shape[0]
+    decoder_inputs = torch.transpose(decoder_inputs, 0, 1)
+
+    outputs = []
+    prev = None
+    for inp in decoder_inputs:
+        if prev is not None:
+            inp = prev
+        state = model.cell(inp, state)
+        output = inp + model.fc1(
+            F.dropout(state, model.dropout, training=model.training))
+        outputs.append(output.view([1, batch_size, model.input_size]))
+        prev = output
+
+    return torch.transpose(torch.cat(outputs, 0), 0, 1)
+
+
+def measure(decode, repeats):
+    """Time a decoder and count the memory it allocates.
+
+    Parameters
+    ----------
+    decode: callable
+        Function without arguments running the decoder.
+    repeats: int
+        Number of timed calls.
+
+    Returns
+    -------
+    milliseconds: float
+        Median time of a call.
+    megabytes: float
+        Memory allocated by a call, freed or not.
+    """
+
+    decode()  # Warm up
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decode()
+        times.append(time.perf_counter() - start)
+
+    with profile(activities=[ProfilerActivity.CPU],
+                 profile_memory=True) as prof:
+        decode()
+    allocated = sum(event.self_cpu_memory_usage
+                    for event in prof.key_averages()
+                    if event.self_cpu_memory_usage > 0)
+
+    return 1e3 * np.median(times), allocated / 2**20
+
+
+def benchmark(args):
+    """Compare the decoder with the list-and-concatenate reference, with
+    and without gradients, on every horizon.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    number_of_actions = 15
+    model = MotionPredictor(args.seq_length_in, max(args.horizons),
+                            args.size, args.batch_size, 0.0, 1.0,
+                            number_of_actions)
+    model.eval()
+
+    state = torch.zeros(args.batch_size, args.size)
+    print(f'{"frames":>6} {"grad":>5} {"concat ms":>10} {"decode ms":>10}'
+          f' {"concat MB":>10} {"decode MB":>10}')
+
+    for horizon in args.horizons:
+        decoder_inputs = torch.randn(args.batch_size, horizon,
+                                     model.input_size)
+
+        for grad in [False, True]:
+            with torch.set_grad_enabled(grad):
+                concat_ms, concat_mb = measure(
+                    lambda: decode_concat(model, decoder_inputs, state),
+                    args.repeats)
+                decode_ms, decode_mb = measure(
+                    lambda: model.decode(decoder_inputs, state),
+                    args.repeats)
+
+            print(f'{horizon:>6} {str(grad):>5} {concat_ms:>10.2f}'
+                  f' {decode_ms:>10.2f} {concat_mb:>10.2f}'
+                  f' {decode_mb:>10.2f}')
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = benchmark_parser()
+
+    # Benchmark function
+    benchmark(args)
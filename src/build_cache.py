@@ -0,0 +1,48 @@
+"""Code for building the binary cache of the H3.6M sequences."""
+
+import logging
+import sys
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import cache_parser
+    from utils.data_utils import load_data
+    from utils.data_utils import define_actions
+    from utils.data_utils import TRAIN_SUBJECT_IDS
+    from utils.data_utils import TEST_SUBJECT_IDS
+else:
+    from src.utils.data_utils import load_data
+    from src.utils.data_utils import define_actions
+    from src.utils.data_utils import TRAIN_SUBJECT_IDS
+    from src.utils.data_utils import TEST_SUBJECT_IDS
+
+
+def build_cache(args):
+    """Parse every sequence once and store it in the binary cache.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    actions = define_actions(args.action)
+    subjects = sorted(TRAIN_SUBJECT_IDS + TEST_SUBJECT_IDS)
+
+    # Loading goes through the cache, which fills it on the first read
+    load_data(args.data_dir, subjects, actions, args.cache_dir,
+              args.load_workers)
+
+    logging.info(f'Cache ready at {args.cache_dir}')
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = cache_parser()
+
+    # Cache building function
+    build_cache(args)
@@ -0,0 +1,130 @@
+"""Client of the prediction server, sending concurrent requests."""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import client_parser
+    from utils.data_utils import load_data
+    from utils.data_utils import TEST_SUBJECT_IDS
+else:
+    from src.utils.data_utils import load_data
+    from src.utils.data_utils import TEST_SUBJECT_IDS
+
+
+def predict(url, seeds, action, target_seq_len, xyz=False, timeout=60):
+    """Ask the server for a prediction.
+
+    Parameters
+    ----------
+    url: str
+        Address of the server, e.g. http://127.0.0.1:8000.
+    seeds: np.array
+        (seed_len, 99) exponential map poses.
+    action: str
+        The action of the seeds.
+    target_seq_len: int
+        Number of poses to predict.
+    xyz: bool
+        Whether to also get the 3d points of the predicted poses.
+    timeout: float
+        Seconds to wait for the answer.
+
+    Returns
+    -------
+    result: dict
+        The predicted `poses`, and their `xyz` points if asked for, as
+        np.arrays.
+    """
+
+    body = json.dumps({
+        'seeds': np.asarray(seeds).tolist(),
+        'action': action,
+        'target_seq_len': target_seq_len,
+        'xyz': xyz,
+    }).encode()
+    request = urllib.request.Request(
+        url + '/predict',
+        data=body,
+        headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        result = json.loads(response.read())
+
+    return {key: np.array(value) for key, value in result.items()}
+
+
+def get_metrics(url, timeout=60):
+    """Get the metrics of the server.
+
+    Parameters
+    ----------
+    url: str
+        Address of the server, e.g. http://127.0.0.1:8000.
+    timeout: float
+        Seconds to wait for the answer.
+
+    Returns
+    -------
+    metrics: dict
+        The metrics of `DynamicBatcher.metrics`.
+    """
+
+    with urllib.request.urlopen(url + '/metrics', timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def run_client(args):
+    """Send seeds of the test subject to the server from concurrent
+    threads, and report the latencies.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    data, _ = load_data(args.data_dir, TEST_SUBJECT_IDS, [args.action],
+                        args.cache_dir)
+    sequences = list(data.values())
+
+    rng = np.random.RandomState(args.seed)
+    seeds = []
+    for _ in range(args.requests):
+        sequence = sequences[rng.randint(len(sequences))]
+        start = rng.randint(sequence.shape[0] - args.seq_length_in)
+        seeds.append(sequence[start:start + args.seq_length_in])
+
+    def send(seed):
+        start = time.perf_counter()
+        predict(args.url, seed, args.action, args.seq_length_out)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        latencies = 1e3 * np.array(list(executor.map(send, seeds)))
+    elapsed = time.perf_counter() - start
+
+    print(f'{args.requests} requests in {elapsed:.2f} s'
+          f' ({args.requests / elapsed:.1f} requests/s)')
+    print('Client latency (ms): ' + ', '.join(
+        f'p{p} {np.percentile(latencies, p):.1f}' for p in [50, 90, 99]))
+    print('Server metrics: ' + json.dumps(get_metrics(args.url), indent=2))
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = client_parser()
+
+    # Client function
+    run_client(args)
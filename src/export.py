@@ -0,0 +1,88 @@
+"""Export a trained model to a self-contained archive for inference."""
+
+import logging
+import sys
+import time
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import export_parser
+    from models.predictor import Predictor
+    from models.scripted import ExportedPredictor
+    from models.scripted import export_model
+else:
+    from src.models.predictor import Predictor
+    from src.models.scripted import ExportedPredictor
+    from src.models.scripted import export_model
+
+
+def time_predict(predict, repeats):
+    """Median time of a prediction function, in ms, after a warm up."""
+
+    predict()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict()
+        times.append(time.perf_counter() - start)
+
+    return 1e3 * np.median(times)
+
+
+def export(args):
+    """Export a checkpoint, then check the archive against the Predictor
+    and compare their speeds.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    output = args.output
+    if not output:
+        output = (args.checkpoint + '_' + args.method +
+                  ('.pt2' if args.method == 'export' else '.pt'))
+
+    predictor = Predictor.load(args.checkpoint, args.stats or None)
+    export_model(predictor, output, args.seq_length_in, args.seq_length_out,
+                 args.method)
+    logging.info(f'Exported {args.checkpoint} to {output}')
+
+    exported = ExportedPredictor.load(output)
+
+    # Seeds drawn around the mean pose, as the data is not needed
+    rng = np.random.RandomState(0)
+    seeds = predictor.data_mean + predictor.data_std * rng.randn(
+        args.batch_size, args.seq_length_in, len(predictor.data_mean))
+    actions = [
+        predictor.actions[i]
+        for i in rng.randint(len(predictor.actions), size=args.batch_size)
+    ]
+
+    expected = predictor.predict(seeds, actions, args.seq_length_out)
+    poses = exported.predict(seeds, actions)
+    print(f'Max difference with Predictor.predict:'
+          f' {np.abs(poses - expected).max():.2e}')
+
+    for name, predict in [
+        ('Predictor', lambda: predictor.predict(seeds, actions,
+                                                args.seq_length_out)),
+        (args.method, lambda: exported.predict(seeds, actions)),
+    ]:
+        print(f'{name}: {time_predict(predict, args.repeats):.2f} ms per'
+              f' batch of {args.batch_size}')
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = export_parser()
+
+    # Export function
+    export(args)
@@ -1,16 +1,28 @@
 """Sequence-to-sequence model for human motion prediction."""
 
 import logging
+import sys
 
 import numpy as np
 import torch
 import torch.nn.functional as F
 from torch import nn
 
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.sampling import WindowSampler
+    from utils.sampling import find_indices_srnn
+else:
+    from src.utils.sampling import WindowSampler
+    from src.utils.sampling import find_indices_srnn
+
 
 class MotionPredictor(nn.Module):
     """Sequence-to-sequence model for human motion prediction"""
 
+    # Default for models saved before the option existed
+    fused_encoder = False
+
     def __init__(
             self,
             source_seq_len,
@@ -20,7 +32,8 @@ class MotionPredictor(nn.Module):
             learning_rate,
             learning_rate_decay_factor,
             number_of_actions,
-            dropout=0.3):
+            dropout=0.3,
+            fused_encoder=False):
         """Constructor of the class.
         
         Parameters
@@ -42,6 +55,11 @@ class MotionPredictor(nn.Module):
             Decay learning rate by this much when needed.
         number_of_actions: int
             Number of classes we have.
+        dropout: float
+            Dropout probability on the recurrent state.
+        fused_encoder: bool
+            Whether to run the encoder as a single `nn.GRU` call, see
+            `encode`.
         """
 
         super(MotionPredictor, self).__init__()
@@ -60,7 +78,39 @@ class MotionPredictor(nn.Module):
         self.cell = torch.nn.GRUCell(self.input_size, self.rnn_size)
         self.fc1 = nn.Linear(self.rnn_size, self.input_size)
 
-    def forward(self, encoder_inputs, decoder_inputs, device):
+        self.encoder = None
+        self.set_fused_encoder(fused_encoder)
+
+    def set_fused_encoder(self, fused):
+        """Switch the fused encoder of `encode` on or off.
+
+        The fused encoder is an `nn.GRU` whose parameters are those of
+        `self.cell`, so both always hold the same weights. It is removed
+        when switched off.
+
+        Parameters
+        ----------
+        fused: bool
+            Whether to run the encoder as a single `nn.GRU` call.
+        """
+
+        if fused and not isinstance(self.cell, nn.GRUCell):
+            raise ValueError('Only models with a float GRU cell can run the'
+                             ' fused encoder')
+
+        if not fused:
+            self.encoder = None
+        elif getattr(self, 'encoder', None) is None:
+            encoder = nn.GRU(self.input_size, self.rnn_size, batch_first=True)
+            encoder.weight_ih_l0 = self.cell.weight_ih
+            encoder.weight_hh_l0 = self.cell.weight_hh
+            encoder.bias_ih_l0 = self.cell.bias_ih
+            encoder.bias_hh_l0 = self.cell.bias_hh
+            self.encoder = encoder
+
+        self.fused_encoder = fused
+
+    def forward(self, encoder_inputs, decoder_inputs, device=None):
         """Forward pass of the model.
 
         Parameters
@@ -70,69 +120,131 @@ class MotionPredictor(nn.Module):
         decoder_inputs : torch.Tensor
             The input to the decoder.
         device : torch.device
-            The device on which to do the computation.
+            Unused, the computation runs on the device of the inputs. Kept
+            for the callers that pass it.
         
         Returns
         -------
         outputs : torch.Tensor
-            The transposed output of the model.
+            The (batch_size, target_seq_len, input_size) output of the
+            model.
         """
 
-        def loop_function(prev, i):
-            return prev
-
-        batch_size = encoder_inputs.shape[0]
-        # To pass these data through a RNN we need to switch the first
-        # two dimensions
-        encoder_inputs = torch.transpose(encoder_inputs, 0, 1)
-        decoder_inputs = torch.transpose(decoder_inputs, 0, 1)
-        state = torch.zeros(batch_size, self.rnn_size).to(device)
+        # Inputs and outputs stay batch first, so no transposes are needed
+        state = encoder_inputs.new_zeros(encoder_inputs.shape[0],
+                                         self.rnn_size)
 
         # Encoding
-        for i in range(self.source_seq_len - 1):
+        state = self.encode(encoder_inputs, state)
+
+        # Decoding, sequentially
+        return self.decode(decoder_inputs, state)
+
+    def encode(self, encoder_inputs, state):
+        """Run the encoder over the source sequence.
+
+        The step-by-step encoder applies dropout to the state after every
+        step, which prevents running the whole sequence at once. If
+        `self.fused_encoder` is set, the sequence runs through a single call
+        of `self.encoder`, an `nn.GRU` sharing the weights of `self.cell`,
+        and dropout is applied to the final state only. Without dropout,
+        i.e. in evaluation, both give the same state.
+
+        Parameters
+        ----------
+        encoder_inputs : torch.Tensor
+            (batch_size, source_seq_len - 1, input_size) input to the
+            encoder.
+        state : torch.Tensor
+            (batch_size, rnn_size) initial state.
+
+        Returns
+        -------
+        state : torch.Tensor
+            (batch_size, rnn_size) state after the last input.
+        """
+
+        # Models saved before the encoder existed have none
+        if self.fused_encoder and getattr(self, 'encoder', None) is not None:
+            _, state = self.encoder(encoder_inputs, state.unsqueeze(0))
+
+            return F.dropout(state[0], self.dropout, training=self.training)
+
+        for i in range(encoder_inputs.shape[1]):
             # Apply the RNN cell
-            state = self.cell(encoder_inputs[i], state)
+            state = self.cell(encoder_inputs[:, i], state)
 
             # Apply dropout in training
             state = F.dropout(state, self.dropout, training=self.training)
 
-        outputs = []
-        prev = None
+        return state
 
-        # Decoding, sequentially
-        for i, inp in enumerate(decoder_inputs):
-            # Use teacher forcing?
-            if prev is not None:
-                inp = loop_function(prev, i)
-            #inp = inp.detach()
+    def decode(self, decoder_inputs, state):
+        """Run the decoder, feeding back its own predictions.
+
+        Without gradients, every step writes its output into a
+        preallocated tensor, in the final layout; otherwise the outputs are
+        stacked at the end, as `out=` arguments do not support autograd.
+
+        Parameters
+        ----------
+        decoder_inputs : torch.Tensor
+            (batch_size, target_seq_len, input_size) input to the decoder;
+            only the first frame is used.
+        state : torch.Tensor
+            (batch_size, rnn_size) state of the encoder.
+
+        Returns
+        -------
+        outputs : torch.Tensor
+            (batch_size, target_seq_len, input_size) predictions.
+        """
 
+        target_seq_len = decoder_inputs.shape[1]
+        preallocate = not torch.is_grad_enabled()
+        if preallocate:
+            outputs = torch.empty_like(decoder_inputs)
+        else:
+            outputs = []
+        inp = decoder_inputs[:, 0]
+
+        for i in range(target_seq_len):
             state = self.cell(inp, state)
 
             # Output is seen as a residual to the previous value
-            output = inp + self.fc1(
+            residual = self.fc1(
                 F.dropout(state, self.dropout, training=self.training))
-            outputs.append(output.view([1, batch_size, self.input_size]))
-            prev = output
+            if preallocate:
+                output = torch.add(inp, residual, out=outputs[:, i])
+            else:
+                output = inp + residual
+                outputs.append(output)
 
-        outputs = torch.cat(outputs, 0)
+            # Every later step takes the previous prediction as input
+            inp = output
 
-        # Size should be batch_size x target_seq_len x input_size
-        outputs = torch.transpose(outputs, 0, 1)
+        if preallocate:
+            return outputs
 
-        return outputs
+        return torch.stack(outputs, dim=1)
 
-    def get_batch(self, data, actions, device):
+    def get_batch(self, data, actions, device, rng=np.random):
         """Get a random batch of data from the specified bucket, prepare
         for step.
         
         Parameters
         ----------
         data:
-            A list of sequences of size n-by-d to fit the model to.
+            A mapping of pose sequences of size n-by-d to fit the model
+            to, or a `WindowSampler` built on it (with the actions) once
+            to skip re-indexing it on every call.
         actions:
-            A list of the actions we are using
+            A list of the actions we are using, in the order of the
+            one-hot encoding appended to the poses.
         device:
             The device on which to do the computation (cpu/gpu)
+        rng:
+            The random generator to draw the windows from.
         
         Returns
         -------
@@ -147,48 +259,66 @@ class MotionPredictor(nn.Module):
             step(...) later.
         """
 
-        # Select entries at random
-        all_keys = list(data.keys())
-        chosen_keys = np.random.choice(len(all_keys), self.batch_size)
+        if not isinstance(data, WindowSampler):
+            data = WindowSampler(data, actions)
+
+        windows = self.sample_windows(data, rng)
+
+        return self.split_windows(windows, device)
+
+    def sample_windows(self, data, rng=np.random):
+        """Draw and gather the windows of a random batch, without moving
+        them to a device. Safe to call from worker threads.
+
+        Parameters
+        ----------
+        data: WindowSampler
+            Sampler over the pose sequences, built with the actions.
+        rng:
+            The random generator to draw the windows from.
+
+        Returns
+        -------
+        windows: np.array
+            (batch_size, source_seq_len + target_seq_len, input_size)
+            float32 array.
+        """
 
         # How many frames in total do we need?
         total_frames = self.source_seq_len + self.target_seq_len
-        encoder_inputs = np.zeros(
-            (self.batch_size, self.source_seq_len - 1, self.input_size),
-            dtype=float)
-        decoder_inputs = np.zeros(
-            (self.batch_size, self.target_seq_len, self.input_size),
-            dtype=float)
-        decoder_outputs = np.zeros(
-            (self.batch_size, self.target_seq_len, self.input_size),
-            dtype=float)
-
-        # Generate the sequences
-        for i in range(self.batch_size):
-            the_key = all_keys[chosen_keys[i]]
-
-            # Get the number of frames
-            n, _ = data[the_key].shape
-
-            # Sample somewhere in the middle
-            idx = np.random.randint(16, n - total_frames)
-
-            # Select the data around the sampled points
-            data_sel = data[the_key][idx:idx + total_frames, :]
-
-            # Add the data
-            encoder_inputs[i, :, 0:self.input_size] = data_sel[
-                0:self.source_seq_len - 1, :]
-            decoder_inputs[i, :, 0:self.input_size] = data_sel[
-                self.source_seq_len - 1:self.source_seq_len +
-                self.target_seq_len - 1, :]
-            decoder_outputs[i, :,
-                            0:self.input_size] = data_sel[self.source_seq_len:,
-                                                          0:self.input_size]
-
-        encoder_inputs = torch.tensor(encoder_inputs).float().to(device)
-        decoder_inputs = torch.tensor(decoder_inputs).float().to(device)
-        decoder_outputs = torch.tensor(decoder_outputs).float().to(device)
+
+        # Select sequences at random, and sample somewhere in the middle
+        seq_indices, starts = data.sample(self.batch_size, total_frames, rng)
+
+        return data.gather(seq_indices, starts, total_frames)
+
+    def split_windows(self, windows, device):
+        """Split gathered windows into encoder/decoder inputs and targets.
+
+        Parameters
+        ----------
+        windows: np.array
+            (batch_size, source_seq_len + target_seq_len, input_size)
+            float32 array.
+        device:
+            The device on which to do the computation (cpu/gpu)
+
+        Returns
+        -------
+        encoder_inputs : torch.Tensor
+            The first source_seq_len - 1 frames of every window.
+        decoder_inputs : torch.Tensor
+            The target_seq_len frames after them.
+        decoder_outputs : torch.Tensor
+            The last target_seq_len frames of every window.
+        """
+
+        # A single transfer; the three outputs are views of it
+        windows = torch.from_numpy(windows).to(device)
+
+        encoder_inputs = windows[:, 0:self.source_seq_len - 1]
+        decoder_inputs = windows[:, self.source_seq_len - 1:-1]
+        decoder_outputs = windows[:, self.source_seq_len:]
 
         return encoder_inputs, decoder_inputs, decoder_outputs
 
@@ -210,34 +340,9 @@ class MotionPredictor(nn.Module):
             A list of indices where the action is found.
         """
 
-        # Used a fixed dummy seed, following
-        # https://github.com/asheshjain399/RNNexp/blob/srnn/structural_rnn/forecastTrajectories.py#L29
-        SEED = 1234567890
-        rng = np.random.RandomState(SEED)
-
-        subject = 5
-        subaction1 = 1
-        subaction2 = 2
-
-        T1 = data[(subject, action, subaction1, 'even')].shape[0]
-        T2 = data[(subject, action, subaction2, 'even')].shape[0]
-        prefix, suffix = 50, 100
-
-        # Test is performed always on subject 5
-        # Select 8 random sub-sequences (by specifying their indices)
-        idx = []
-        idx.append(rng.randint(16, T1 - prefix - suffix))
-        idx.append(rng.randint(16, T2 - prefix - suffix))
-        idx.append(rng.randint(16, T1 - prefix - suffix))
-        idx.append(rng.randint(16, T2 - prefix - suffix))
-        idx.append(rng.randint(16, T1 - prefix - suffix))
-        idx.append(rng.randint(16, T2 - prefix - suffix))
-        idx.append(rng.randint(16, T1 - prefix - suffix))
-        idx.append(rng.randint(16, T2 - prefix - suffix))
-
-        return idx
-
-    def get_batch_srnn(self, data, action, device):
+        return find_indices_srnn(data, action)
+
+    def get_batch_srnn(self, data, action, device, actions=None):
         """Get a random batch of data from the specified bucket,
         prepare for step.
 
@@ -245,9 +350,16 @@ class MotionPredictor(nn.Module):
         ----------
         data: dict
             Dictionary with k:v, k=((subject, action, subsequence, 'even')),
-            v=nxd matrix with a sequence of poses.
+            v=nxd matrix with a sequence of poses, or a `WindowSampler`
+            built on it (with the actions).
         action: str
             The action to load data from, e.g. 'walking'.
+        device:
+            The device on which to do the computation (cpu/gpu)
+        actions: list
+            A list of the actions we are using, in the order of the
+            one-hot encoding. Only needed if `data` is not a sampler and
+            the model was trained on several actions.
         
         Returns
         -------
@@ -262,55 +374,28 @@ class MotionPredictor(nn.Module):
             step(...) later.
         """
 
-        actions = [
+        known_actions = [
             'directions', 'discussion', 'eating', 'greeting', 'phoning',
             'posing', 'purchases', 'sitting', 'sittingdown', 'smoking',
             'takingphoto', 'waiting', 'walking', 'walkingdog',
             'walkingtogether'
         ]
 
-        if not action in actions:
+        if not action in known_actions:
             raise ValueError(f'Unrecognized action {action}')
 
-        frames = {}
-        frames[action] = self.find_indices_srnn(data, action)
-
-        batch_size = 8  # we always evaluate 8 sequences
-        subject = 5  # we always evaluate on subject 5
-        source_seq_len = self.source_seq_len
-        target_seq_len = self.target_seq_len
-
-        seeds = [(action, (i % 2) + 1, frames[action][i])
-                 for i in range(batch_size)]
-
-        encoder_inputs = np.zeros(
-            (batch_size, source_seq_len - 1, self.input_size), dtype=float)
-        decoder_inputs = np.zeros(
-            (batch_size, target_seq_len, self.input_size), dtype=float)
-        decoder_outputs = np.zeros(
-            (batch_size, target_seq_len, self.input_size), dtype=float)
-
-        # Compute the number of frames needed
-        total_frames = source_seq_len + target_seq_len
+        if not isinstance(data, WindowSampler):
+            if actions is None:
+                if self.input_size - self.human_dofs != 1:
+                    raise ValueError('The actions of the one-hot encoding'
+                                     ' are needed for multi-action models')
+                actions = [action]
+            data = WindowSampler(data, actions)
 
         # Reproducing SRNN's sequence subsequence selection as done in
         # https://github.com/asheshjain399/RNNexp/blob/master/structural_rnn/CRFProblems/H3.6m/processdata.py#L343
-        for i in range(batch_size):
-            _, subsequence, idx = seeds[i]
-            idx = idx + 50
+        seq_indices, starts = data.srnn_seeds(action, self.source_seq_len)
+        windows = data.gather(seq_indices, starts,
+                              self.source_seq_len + self.target_seq_len)
 
-            data_sel = data[(subject, action, subsequence, 'even')]
-            data_sel = data_sel[(idx - source_seq_len):(idx +
-                                                        target_seq_len), :]
-
-            encoder_inputs[i, :, :] = data_sel[0:source_seq_len - 1, :]
-            decoder_inputs[i, :, :] = data_sel[source_seq_len -
-                                               1:(source_seq_len +
-                                                  target_seq_len - 1), :]
-            decoder_outputs[i, :, :] = data_sel[source_seq_len:, :]
-
-        encoder_inputs = torch.tensor(encoder_inputs).float().to(device)
-        decoder_inputs = torch.tensor(decoder_inputs).float().to(device)
-        decoder_outputs = torch.tensor(decoder_outputs).float().to(device)
-
-        return encoder_inputs, decoder_inputs, decoder_outputs
+        return self.split_windows(windows, device)
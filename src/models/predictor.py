@@ -0,0 +1,224 @@
+"""Inference engine wrapping a trained model and its normalization stats."""
+
+import os
+import sys
+
+import numpy as np
+import torch
+from torch import nn
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.data_utils import Denormalizer
+    from utils.data_utils import load_normalization_stats
+    from utils.data_utils import STATS_FNAME
+    from utils.forward_kinematics import fkl_batch
+else:
+    from src.utils.data_utils import Denormalizer
+    from src.utils.data_utils import load_normalization_stats
+    from src.utils.data_utils import STATS_FNAME
+    from src.utils.forward_kinematics import fkl_batch
+
+
+class Predictor(object):
+    """Predicts future poses from raw exponential map seeds.
+
+    Normalizes the seeds with the stats of the training data, appends the
+    one-hot encoding of the action, runs the model under inference mode
+    with dropout off, and denormalizes its outputs back to the 99 channels.
+    Models with float weights run the fused encoder, which gives the same
+    predictions without dropout.
+    """
+
+    def __init__(self,
+                 model,
+                 data_mean,
+                 data_std,
+                 dim_to_ignore,
+                 dim_to_use,
+                 actions,
+                 device=None):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        model: MotionPredictor
+            The trained model.
+        data_mean: np.array
+            99-long vector with the mean of the training data.
+        data_std: np.array
+            99-long vector with the standard deviation of the training data.
+        dim_to_ignore: np.array
+            Dimensions that the model does not use.
+        dim_to_use: np.array
+            Dimensions that the model uses.
+        actions: list
+            A list of the actions the model was trained on, in the order
+            of the one-hot encoding.
+        device: torch.device
+            Device to run the model on; the device of the model if None.
+        """
+
+        if device is None:
+            # Quantized models have no float parameters, and run on the CPU
+            parameter = next(model.parameters(), None)
+            device = 'cpu' if parameter is None else parameter.device
+
+        self.device = torch.device(device)
+        self.model = model.to(self.device)
+        self.model.eval()
+        if isinstance(self.model.cell, nn.GRUCell):
+            self.model.set_fused_encoder(True)
+
+        self.actions = list(actions)
+        self.data_mean = data_mean
+        self.data_std = data_std
+        self.dim_to_ignore = np.asarray(dim_to_ignore)
+        self.dim_to_use = np.asarray(dim_to_use)
+        # Normalize in double precision, as normalize_data does
+        self.mean_to_use = data_mean[self.dim_to_use].astype(np.float64)
+        self.std_to_use = data_std[self.dim_to_use].astype(np.float64)
+        self.denormalize = Denormalizer(data_mean, data_std, dim_to_ignore)
+
+    @classmethod
+    def load(cls, checkpoint_path, stats_path=None, device=None):
+        """Load a checkpoint saved by `train.py` and its stats.
+
+        Parameters
+        ----------
+        checkpoint_path: str
+            Path to the saved model, e.g. `<train_dir>/model_1000`.
+        stats_path: str
+            Path to the normalization stats; the stats file next to the
+            checkpoint if None.
+        device: torch.device
+            Device to run the model on; the CPU if None.
+
+        Returns
+        -------
+        predictor: Predictor
+            The predictor of the checkpoint.
+        """
+
+        if stats_path is None:
+            stats_path = os.path.join(os.path.dirname(checkpoint_path),
+                                      STATS_FNAME)
+        if device is None:
+            device = torch.device('cpu')
+
+        # Checkpoints are whole pickled modules, not only weights
+        model = torch.load(checkpoint_path,
+                           map_location=device,
+                           weights_only=False)
+        data_mean, data_std, dim_to_ignore, dim_to_use, actions = \
+            load_normalization_stats(stats_path)
+
+        return cls(model, data_mean, data_std, dim_to_ignore, dim_to_use,
+                   actions, device)
+
+    def normalize(self, seeds, action):
+        """Build the normalized inputs of the model from raw seeds.
+
+        Parameters
+        ----------
+        seeds: np.array
+            (batch_size, seed_len, 99) exponential map poses.
+        action: str or list
+            The action of all the seeds, or a list with the action of
+            every seed.
+
+        Returns
+        -------
+        inputs: np.array
+            (batch_size, seed_len, input_size) float32 inputs, with the
+            one-hot encoding of the actions.
+        """
+
+        batch_size, seed_len, _ = seeds.shape
+        if isinstance(action, str):
+            action = [action] * batch_size
+        for a in action:
+            if a not in self.actions:
+                raise ValueError(f'Model was not trained on action {a}')
+
+        n_dims = len(self.dim_to_use)
+        inputs = np.zeros((batch_size, seed_len, n_dims + len(self.actions)),
+                          dtype=np.float32)
+        inputs[..., :n_dims] = np.divide(
+            seeds[..., self.dim_to_use] - self.mean_to_use, self.std_to_use)
+        one_hot = n_dims + np.array([self.actions.index(a) for a in action])
+        inputs[np.arange(batch_size), :, one_hot] = 1
+
+        return inputs
+
+    def forward(self, encoder_inputs, decoder_inputs):
+        """Run the model on normalized inputs, without gradients.
+
+        Parameters
+        ----------
+        encoder_inputs : torch.Tensor
+            (batch_size, seed_len - 1, input_size) input to the encoder.
+        decoder_inputs : torch.Tensor
+            (batch_size, target_seq_len, input_size) input to the decoder;
+            only the first frame is used.
+
+        Returns
+        -------
+        outputs : torch.Tensor
+            (batch_size, target_seq_len, input_size) normalized
+            predictions.
+        """
+
+        with torch.inference_mode():
+            return self.model(encoder_inputs.to(self.device),
+                              decoder_inputs.to(self.device), self.device)
+
+    def predict(self, seeds, action, target_seq_len=None, xyz=False):
+        """Predict the poses following seed sequences.
+
+        Parameters
+        ----------
+        seeds: np.array
+            (seed_len, 99) exponential map poses, or a (batch_size,
+            seed_len, 99) batch of them. The last pose is the first input
+            of the decoder, the previous ones go through the encoder.
+        action: str or list
+            The action of all the seeds, or a list with the action of
+            every seed.
+        target_seq_len: int
+            Number of poses to predict; the one of the model if None.
+        xyz: bool
+            Whether to also return the 3d points of the predicted poses.
+
+        Returns
+        -------
+        poses: np.array
+            (target_seq_len, 99), or (batch_size, target_seq_len, 99),
+            denormalized exponential map predictions.
+        xyz: np.array
+            (target_seq_len, 96), or (batch_size, target_seq_len, 96), 3d
+            points of the predictions, in the format of `fkl`. Only
+            returned if `xyz` is set.
+        """
+
+        seeds = np.asarray(seeds)
+        single = seeds.ndim == 2
+        if single:
+            seeds = seeds[None]
+        if target_seq_len is None:
+            target_seq_len = self.model.target_seq_len
+
+        inputs = torch.from_numpy(self.normalize(seeds, action))
+        encoder_inputs = inputs[:, :-1]
+        # Only the first decoder input is used; the others are views of it
+        decoder_inputs = inputs[:, -1:].expand(-1, target_seq_len, -1)
+
+        outputs = self.forward(encoder_inputs, decoder_inputs)
+        poses = self.denormalize(outputs.cpu().numpy())
+
+        if single:
+            poses = poses[0]
+        if not xyz:
+            return poses
+
+        return poses, fkl_batch(poses)
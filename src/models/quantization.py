@@ -0,0 +1,73 @@
+"""Dynamic int8 quantization of a trained model for CPU inference."""
+
+import copy
+import io
+
+import torch
+from torch import nn
+
+# Deprecated since torch 2.10 in favour of torchao, and to be removed
+try:
+    from torch.ao.quantization import quantize_dynamic
+except ImportError:
+    quantize_dynamic = None
+
+
+def quantize_model(model):
+    """Quantize the weights of the cell and output layer of a model to int8.
+
+    The weights are stored as int8, and the activations are quantized on
+    the fly at every step, so no calibration data is needed. The scale of
+    the activations comes from the whole batch, so a prediction depends
+    slightly on the other sequences it is batched with. Quantized kernels
+    only run on the CPU, and the encoder runs step by step, as the fused
+    encoder needs float weights.
+
+    It relies on `torch.ao.quantization.quantize_dynamic` and the quantized
+    GRU cell, which torch deprecates in favour of the torchao package and
+    warns about; they will be removed in a later torch release.
+
+    Parameters
+    ----------
+    model: MotionPredictor
+        The trained model, on the CPU. It is left unchanged.
+
+    Returns
+    -------
+    quantized: MotionPredictor
+        A quantized copy of the model, in evaluation mode.
+    """
+
+    if quantize_dynamic is None:
+        raise ImportError('torch.ao.quantization.quantize_dynamic is not'
+                          ' available in this torch release, use a torch'
+                          ' release that still has it to quantize models')
+    if any(p.device.type != 'cpu' for p in model.parameters()):
+        raise ValueError('Quantized models only run on the CPU, move the'
+                         ' model to the CPU first')
+
+    quantized = copy.deepcopy(model).eval()
+    quantized.set_fused_encoder(False)
+
+    return quantize_dynamic(quantized, {nn.GRUCell, nn.Linear},
+                            dtype=torch.qint8)
+
+
+def serialized_size(model):
+    """Size of the saved weights of a model, in bytes.
+
+    Parameters
+    ----------
+    model: torch.nn.Module
+        The model.
+
+    Returns
+    -------
+    size: int
+        Number of bytes of its saved state dict.
+    """
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+
+    return buffer.getbuffer().nbytes
@@ -0,0 +1,309 @@
+"""Self-contained TorchScript and torch.export archives of a trained model
+for inference."""
+
+import copy
+import json
+import sys
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.forward_kinematics import fkl_batch
+    from utils.torch_evaluation import unnormalize
+else:
+    from src.utils.forward_kinematics import fkl_batch
+    from src.utils.torch_evaluation import unnormalize
+
+# Name of the JSON metadata stored in the exported archives
+METADATA_FNAME = 'metadata.json'
+
+EXPORT_METHODS = ['trace', 'export']
+
+
+class InferenceModel(nn.Module):
+    """Inference graph of a `MotionPredictor`, from raw seeds to raw poses.
+
+    Normalizes the seeds, appends the one-hot encoding of the actions, runs
+    `encode` and `decode` of the model, and denormalizes the predictions,
+    as `Predictor.predict` does. The stats are buffers, so that the graph
+    recorded by tracing or exporting it runs with nothing but torch.
+    """
+
+    def __init__(self, model, data_mean, data_std, dim_to_use, actions,
+                 seed_len, target_seq_len):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        model: MotionPredictor
+            The trained model, in evaluation mode.
+        data_mean: np.array
+            99-long vector with the mean of the training data.
+        data_std: np.array
+            99-long vector with the standard deviation of the training data.
+        dim_to_use: np.array
+            Dimensions that the model uses.
+        actions: list
+            A list of the actions the model was trained on, in the order
+            of the one-hot encoding.
+        seed_len: int
+            Number of poses of the seeds.
+        target_seq_len: int
+            Number of poses to predict.
+        """
+
+        super(InferenceModel, self).__init__()
+
+        self.model = model
+        self.n_actions = len(actions)
+        self.seed_len = seed_len
+        self.target_seq_len = target_seq_len
+
+        dim_to_use = np.asarray(dim_to_use)
+        # Normalize in double precision, and denormalize in the precision
+        # of the stats, as `Predictor` and `Denormalizer` do
+        dtype = np.result_type(np.float32, data_mean, data_std)
+        self.register_buffer('dim_to_use', torch.from_numpy(dim_to_use))
+        self.register_buffer(
+            'mean_to_use',
+            torch.tensor(data_mean[dim_to_use], dtype=torch.float64))
+        self.register_buffer(
+            'std_to_use', torch.tensor(data_std[dim_to_use],
+                                       dtype=torch.float64))
+        self.register_buffer('data_mean',
+                             torch.from_numpy(data_mean.astype(dtype)))
+        self.register_buffer('data_std',
+                             torch.from_numpy(data_std.astype(dtype)))
+
+    def forward(self, seeds, actions):
+        """Predict the poses following seed sequences.
+
+        Parameters
+        ----------
+        seeds : torch.Tensor
+            (batch_size, seed_len, 99) exponential map poses.
+        actions : torch.Tensor
+            (batch_size, ) indices of the actions of the seeds.
+
+        Returns
+        -------
+        poses : torch.Tensor
+            (batch_size, target_seq_len, 99) denormalized exponential map
+            predictions, in the dtype of the stats.
+        """
+
+        # Inputs of the model, as `Predictor.normalize`
+        poses = torch.div(
+            seeds[:, :, self.dim_to_use].double() - self.mean_to_use,
+            self.std_to_use).float()
+        one_hot = F.one_hot(actions, self.n_actions).float()
+        inputs = torch.cat(
+            [poses, one_hot[:, None].expand(-1, seeds.shape[1], -1)], -1)
+
+        state = inputs.new_zeros(inputs.shape[0], self.model.rnn_size)
+        state = self.model.encode(inputs[:, :-1], state)
+        # The decoder only reads its first input
+        predictions = self.model.decode(
+            inputs[:, -1:].expand(-1, self.target_seq_len, -1), state)
+
+        return unnormalize(predictions.to(self.data_mean.dtype),
+                           self.data_mean, self.data_std, self.dim_to_use)
+
+
+def export_model(predictor, path, seed_len, target_seq_len, method='trace'):
+    """Export the model of a Predictor to an archive.
+
+    Parameters
+    ----------
+    predictor: Predictor
+        Predictor with the model and stats to export.
+    path: str
+        Path of the archive to write; it must end with .pt2 for the
+        `export` method, and must not otherwise.
+    seed_len: int
+        Number of poses of the seeds.
+    target_seq_len: int
+        Number of poses to predict.
+    method: str
+        `trace` records the TorchScript graph of the model, with the
+        decoder loop unrolled for `target_seq_len` steps, and freezes it,
+        with the weights and stats inlined as constants. `export` writes a
+        `torch.export` program, also unrolled, with a dynamic batch size.
+
+    Returns
+    -------
+    module: torch.jit.ScriptModule or torch.export.ExportedProgram
+        The module or program written to the archive.
+    """
+
+    if method not in EXPORT_METHODS:
+        raise ValueError(f'method must be one of {EXPORT_METHODS}')
+    if (method == 'export') != path.endswith('.pt2'):
+        raise ValueError('Only archives of the export method end with .pt2')
+    if seed_len < 2:
+        raise ValueError('Seeds need at least 2 poses')
+    if not isinstance(predictor.model.cell, nn.GRUCell):
+        raise ValueError('Only models with float weights can be exported')
+
+    # A copy, so that switching on the fused encoder leaves the predictor
+    # unchanged. Without gradients on the weights, the outputs that
+    # `decode` writes in place are valid with gradients on too.
+    model = copy.deepcopy(predictor.model).requires_grad_(False)
+    model.set_fused_encoder(True)
+    model = InferenceModel(model, predictor.data_mean,
+                           predictor.data_std, predictor.dim_to_use,
+                           predictor.actions, seed_len, target_seq_len)
+    model = model.to(predictor.device).eval()
+
+    # Any example works, the graphs do not depend on the values
+    seeds = torch.tensor(predictor.data_mean,
+                         dtype=torch.float64,
+                         device=predictor.device)
+    seeds = seeds.expand(2, seed_len, -1)
+    actions = torch.zeros(2, dtype=torch.long, device=predictor.device)
+
+    metadata = json.dumps({
+        'actions': predictor.actions,
+        'seed_len': seed_len,
+        'target_seq_len': target_seq_len,
+        'method': method,
+    })
+
+    if method == 'export':
+        batch_size = torch.export.Dim('batch_size')
+        dynamic_shapes = ({0: batch_size}, {0: batch_size})
+        program = torch.export.export(model, (seeds, actions),
+                                      dynamic_shapes=dynamic_shapes)
+        torch.export.save(program,
+                          path,
+                          extra_files={METADATA_FNAME: metadata})
+
+        return program
+
+    with torch.no_grad():
+        module = torch.jit.freeze(torch.jit.trace(model, (seeds, actions)))
+    torch.jit.save(module, path, _extra_files={METADATA_FNAME: metadata})
+
+    return module
+
+
+class ExportedPredictor(object):
+    """Predicts future poses with an archive of `export_model`.
+
+    The archives run without the source tree: `torch.jit.load` them, or
+    `torch.export.load` the .pt2 ones and take their `module()`, and call
+    the module with (batch_size, seed_len, 99) seeds and the indices of
+    their actions, in the order of the `actions` of their metadata.json.
+    This class only adds the handling of numpy arrays and action names.
+    """
+
+    def __init__(self, module, actions, seed_len, target_seq_len,
+                 device=None):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        module: torch.nn.Module
+            The loaded TorchScript module, or module of the loaded program.
+        actions: list
+            A list of the actions of the one-hot encoding.
+        seed_len: int
+            Number of poses of the seeds.
+        target_seq_len: int
+            Number of poses predicted.
+        device: torch.device
+            Device the module is on; the CPU if None.
+        """
+
+        self.module = module
+        self.actions = list(actions)
+        self.seed_len = seed_len
+        self.target_seq_len = target_seq_len
+        self.device = torch.device(device or 'cpu')
+
+    @classmethod
+    def load(cls, path, device=None):
+        """Load an archive written by `export_model`.
+
+        Parameters
+        ----------
+        path: str
+            Path to the archive.
+        device: torch.device
+            Device to run the module on; the CPU if None.
+
+        Returns
+        -------
+        predictor: ExportedPredictor
+            The predictor of the archive.
+        """
+
+        extra_files = {METADATA_FNAME: ''}
+        if path.endswith('.pt2'):
+            module = torch.export.load(path, extra_files=extra_files).module()
+            if device is not None:
+                module = module.to(device)
+        else:
+            module = torch.jit.load(path,
+                                    map_location=device,
+                                    _extra_files=extra_files)
+        metadata = json.loads(extra_files[METADATA_FNAME])
+
+        return cls(module, metadata['actions'], metadata['seed_len'],
+                   metadata['target_seq_len'], device)
+
+    def predict(self, seeds, action, xyz=False):
+        """Predict the poses following seed sequences.
+
+        Parameters
+        ----------
+        seeds: np.array
+            (seed_len, 99) exponential map poses, or a (batch_size,
+            seed_len, 99) batch of them.
+        action: str or list
+            The action of all the seeds, or a list with the action of
+            every seed.
+        xyz: bool
+            Whether to also return the 3d points of the predicted poses.
+
+        Returns
+        -------
+        poses: np.array
+            (target_seq_len, 99), or (batch_size, target_seq_len, 99),
+            denormalized exponential map predictions.
+        xyz: np.array
+            (target_seq_len, 96), or (batch_size, target_seq_len, 96), 3d
+            points of the predictions, in the format of `fkl`. Only
+            returned if `xyz` is set.
+        """
+
+        seeds = np.asarray(seeds, dtype=np.float64)
+        single = seeds.ndim == 2
+        if single:
+            seeds = seeds[None]
+        if seeds.shape[1] != self.seed_len:
+            raise ValueError(f'The model was exported for seeds of'
+                             f' {self.seed_len} poses, got {seeds.shape[1]}')
+        if isinstance(action, str):
+            action = [action] * seeds.shape[0]
+        for a in action:
+            if a not in self.actions:
+                raise ValueError(f'Model was not trained on action {a}')
+        indices = torch.tensor([self.actions.index(a) for a in action],
+                               device=self.device)
+
+        with torch.inference_mode():
+            poses = self.module(
+                torch.from_numpy(seeds).to(self.device), indices)
+        poses = poses.cpu().numpy()
+
+        if single:
+            poses = poses[0]
+        if not xyz:
+            return poses
+
+        return poses, fkl_batch(poses)
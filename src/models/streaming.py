@@ -0,0 +1,211 @@
+"""Stateful, frame-by-frame prediction for many concurrent streams."""
+
+import itertools
+import sys
+
+import numpy as np
+import torch
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from models.predictor import Predictor
+else:
+    from src.models.predictor import Predictor
+
+
+class StreamingPredictor(object):
+    """Online forecasting over streams of poses.
+
+    Every stream keeps the state of the encoder and its latest frame. A
+    new frame moves the previous one through `model.cell`, so updating a
+    stream costs one step whatever its length; a forecast decodes from the
+    current state, with the latest frame as first input, and leaves the
+    stream unchanged. After pushing n frames, a forecast equals, up to
+    float rounding, the prediction of `Predictor.predict` on those n frames
+    as seed.
+
+    Pushes and forecasts of several streams run as one batch. Not thread
+    safe: calls must not run concurrently.
+    """
+
+    def __init__(self, predictor):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        predictor: Predictor
+            Predictor with the model and stats to use.
+        """
+
+        self.predictor = predictor
+        self.model = predictor.model
+        self.device = predictor.device
+        self.streams = {}
+        self.handles = itertools.count()
+
+    @classmethod
+    def load(cls, checkpoint_path, stats_path=None, device=None):
+        """Load a checkpoint saved by `train.py` and its stats, see
+        `Predictor.load`.
+
+        Returns
+        -------
+        streaming: StreamingPredictor
+            The streaming predictor of the checkpoint.
+        """
+
+        return cls(Predictor.load(checkpoint_path, stats_path, device))
+
+    def open(self, action):
+        """Start a new stream.
+
+        Parameters
+        ----------
+        action: str
+            The action of the stream, for the one-hot encoding.
+
+        Returns
+        -------
+        handle: int
+            Handle of the stream, for the other calls.
+        """
+
+        if action not in self.predictor.actions:
+            raise ValueError(f'Model was not trained on action {action}')
+
+        handle = next(self.handles)
+        self.streams[handle] = {
+            'action': action,
+            'state': torch.zeros(self.model.rnn_size, device=self.device),
+            'frame': None,
+            'length': 0,
+        }
+
+        return handle
+
+    def close(self, handle):
+        """Drop a stream and its state.
+
+        Parameters
+        ----------
+        handle: int
+            Handle of the stream.
+        """
+
+        self._stream(handle)
+        del self.streams[handle]
+
+    def __len__(self):
+        return len(self.streams)
+
+    def length(self, handle):
+        """Number of frames pushed to a stream.
+
+        Parameters
+        ----------
+        handle: int
+            Handle of the stream.
+
+        Returns
+        -------
+        length: int
+            Number of frames pushed so far.
+        """
+
+        return self._stream(handle)['length']
+
+    def push(self, handles, frames):
+        """Add a new frame to streams.
+
+        Parameters
+        ----------
+        handles: int or list
+            Handle of a stream, or a list of distinct handles.
+        frames: np.array
+            The new 99-long exponential map pose, or a (len(handles), 99)
+            matrix with one per stream.
+        """
+
+        handles, frames = self._batch(handles, frames)
+        streams = [self._stream(handle) for handle in handles]
+        if len(set(handles)) != len(handles):
+            raise ValueError('Every stream can get one frame per push')
+
+        inputs = torch.from_numpy(
+            self.predictor.normalize(frames[:, None],
+                                     [s['action'] for s in streams])[:, 0])
+        inputs = inputs.to(self.device)
+
+        # Move the previous frames of the streams through the encoder
+        ready = [s for s in streams if s['frame'] is not None]
+        if ready:
+            with torch.inference_mode():
+                states = self.model.cell(
+                    torch.stack([s['frame'] for s in ready]),
+                    torch.stack([s['state'] for s in ready]))
+            for stream, state in zip(ready, states):
+                stream['state'] = state
+
+        for stream, frame in zip(streams, inputs):
+            stream['frame'] = frame
+            stream['length'] += 1
+
+    def forecast(self, handles, target_seq_len):
+        """Predict the next poses of streams, without changing them.
+
+        Parameters
+        ----------
+        handles: int or list
+            Handle of a stream, or a list of handles.
+        target_seq_len: int
+            Number of poses to predict.
+
+        Returns
+        -------
+        poses: np.array
+            (target_seq_len, 99) denormalized exponential map predictions,
+            or (len(handles), target_seq_len, 99) for a list of handles.
+        """
+
+        single = np.isscalar(handles)
+        if single:
+            handles = [handles]
+        streams = [self._stream(handle) for handle in handles]
+        if any(s['frame'] is None for s in streams):
+            raise ValueError('Streams need a frame before a forecast')
+
+        frames = torch.stack([s['frame'] for s in streams])
+        states = torch.stack([s['state'] for s in streams])
+        # Only the first decoder input is used; the others are views of it
+        decoder_inputs = frames[:, None].expand(-1, target_seq_len, -1)
+
+        with torch.inference_mode():
+            outputs = self.model.decode(decoder_inputs, states)
+        poses = self.predictor.denormalize(outputs.cpu().numpy())
+
+        if single:
+            return poses[0]
+
+        return poses
+
+    def _stream(self, handle):
+        """The stream of a handle, checking that it is open."""
+
+        try:
+            return self.streams[handle]
+        except KeyError:
+            raise ValueError(f'Unknown stream {handle}') from None
+
+    def _batch(self, handles, frames):
+        """Turn a handle and frame, or lists of them, into a list and a
+        matrix."""
+
+        frames = np.asarray(frames)
+        if np.isscalar(handles):
+            return [handles], frames.reshape(1, -1)
+        handles = list(handles)
+        if frames.shape != (len(handles), 99):
+            raise ValueError(f'Expected ({len(handles)}, 99) frames, got'
+                             f' {frames.shape}')
+
+        return handles, frames
@@ -55,6 +55,45 @@ def training_parser():
                         default=100,
                         type=int)
 
+    parser.add_argument('--fused_encoder',
+                        dest='fused_encoder',
+                        help='Run the encoder as a single fused GRU call,'
+                        ' applying dropout to its final state only.',
+                        action='store_true')
+
+    parser.add_argument('--xyz_loss_weight',
+                        dest='xyz_loss_weight',
+                        help='Weight of the mean error of the 3d joint'
+                        ' positions (in mm) added to the loss. 0 trains'
+                        ' on the angles only.',
+                        default=0.0,
+                        type=float)
+
+    parser.add_argument('--prefetch_depth',
+                        dest='prefetch_depth',
+                        help='Number of training batches prepared ahead'
+                        ' in the background. 0 prepares them in the'
+                        ' training loop. Mutually exclusive with'
+                        ' --dataloader_workers.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--prefetch_workers',
+                        dest='prefetch_workers',
+                        help='Number of threads preparing batches when'
+                        ' prefetching.',
+                        default=1,
+                        type=int)
+
+    parser.add_argument('--dataloader_workers',
+                        dest='dataloader_workers',
+                        help='Number of DataLoader worker processes'
+                        ' preparing training batches. 0 disables the'
+                        ' DataLoader. Mutually exclusive with'
+                        ' --prefetch_depth.',
+                        default=0,
+                        type=int)
+
     parser.add_argument('--size',
                         dest='size',
                         help='Size of each model layer.',
@@ -88,6 +127,28 @@ def training_parser():
                         default=os.path.normpath("./experiments/"),
                         type=str)
 
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the'
+                        ' parsed sequences. Empty to disable the cache.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--packed_dir',
+                        dest='packed_dir',
+                        help='Directory where the normalized data is'
+                        ' packed and memory-mapped from. Empty to keep'
+                        ' it in memory.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--load_workers',
+                        dest='load_workers',
+                        help='Number of worker processes loading the'
+                        ' sequences. 0 loads them serially.',
+                        default=0,
+                        type=int)
+
     parser.add_argument('--action',
                         dest='action',
                         help='The action to train on. all means all the'
@@ -132,11 +193,19 @@ def training_parser_from_dict(dict_args):
         'batch_size': 128,
         'iterations': int(1e5),
         'test_every': 100,
+        'xyz_loss_weight': 0.0,
+        'fused_encoder': False,
+        'prefetch_depth': 0,
+        'prefetch_workers': 1,
+        'dataloader_workers': 0,
         'size': 512,
         'seq_length_in': 50,
         'seq_length_out': 10,
         'data_dir': os.path.normpath('./data/h3.6m/dataset'),
         'train_dir': os.path.normpath('./experiments/'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'packed_dir': '',
+        'load_workers': 0,
         'action': 'all',
         'log_level': 20,
         'log_file': '',
@@ -211,6 +280,28 @@ def testing_parser():
                         default=os.path.normpath("./experiments/"),
                         type=str)
 
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the'
+                        ' parsed sequences. Empty to disable the cache.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--packed_dir',
+                        dest='packed_dir',
+                        help='Directory where the normalized data is'
+                        ' packed and memory-mapped from. Empty to keep'
+                        ' it in memory.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--load_workers',
+                        dest='load_workers',
+                        help='Number of worker processes loading the'
+                        ' sequences. 0 loads them serially.',
+                        default=0,
+                        type=int)
+
     parser.add_argument('--action',
                         dest='action',
                         help='The action to train on. all means all the'
@@ -263,6 +354,9 @@ def testing_parser_from_dict(dict_args):
         'horizon_test_step': 25,
         'data_dir': os.path.normpath('./data/h3.6m/dataset'),
         'train_dir': os.path.normpath('./experiments/'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'packed_dir': '',
+        'load_workers': 0,
         'action': 'all',
         'load_model': 0,
         'log_level': 20,
@@ -275,6 +369,866 @@ def testing_parser_from_dict(dict_args):
     return args
 
 
+def cache_parser():
+    """Argument parser for the cache building script.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Build the binary cache of the H3.6M sequences')
+
+    parser.add_argument('--data_dir',
+                        dest='data_dir',
+                        help='Data directory',
+                        default=os.path.normpath("./data/h3.6m/dataset"),
+                        type=str)
+
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the'
+                        ' parsed sequences.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--load_workers',
+                        dest='load_workers',
+                        help='Number of worker processes loading the'
+                        ' sequences. 0 loads them serially.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--action',
+                        dest='action',
+                        help='The action to cache. all means all the'
+                        'actions, all_periodic means walking, eating'
+                        'and smoking',
+                        default='all',
+                        type=str)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def cache_parser_from_dict(dict_args):
+    """Build cache parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'data_dir': os.path.normpath('./data/h3.6m/dataset'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'load_workers': 0,
+        'action': 'all',
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def benchmark_parser():
+    """Argument parser for the benchmark script.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the decoder of the motion prediction model')
+
+    parser.add_argument('--size',
+                        dest='size',
+                        help='Size of each model layer.',
+                        default=512,
+                        type=int)
+
+    parser.add_argument('--batch_size',
+                        dest='batch_size',
+                        help='Batch size to use.',
+                        default=8,
+                        type=int)
+
+    parser.add_argument('--seq_length_in',
+                        dest='seq_length_in',
+                        help='Number of frames to feed into the encoder.'
+                        ' 25 fps',
+                        default=50,
+                        type=int)
+
+    parser.add_argument('--horizons',
+                        dest='horizons',
+                        help='Numbers of frames to decode.',
+                        nargs='+',
+                        default=[10, 25, 100, 250],
+                        type=int)
+
+    parser.add_argument('--repeats',
+                        dest='repeats',
+                        help='Number of timed calls per measure.',
+                        default=20,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def benchmark_parser_from_dict(dict_args):
+    """Build benchmark parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'size': 512,
+        'batch_size': 8,
+        'seq_length_in': 50,
+        'horizons': [10, 25, 100, 250],
+        'repeats': 20,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def serve_parser():
+    """Argument parser for the prediction server.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Serve the predictions of a trained model over HTTP')
+
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        help='Path to the saved model, e.g.'
+                        ' <train_dir>/model_1000.',
+                        required=True,
+                        type=str)
+
+    parser.add_argument('--stats',
+                        dest='stats',
+                        help='Path to the normalization stats. Empty uses'
+                        ' the ones saved next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--host',
+                        dest='host',
+                        help='Address to listen on.',
+                        default='127.0.0.1',
+                        type=str)
+
+    parser.add_argument('--port',
+                        dest='port',
+                        help='Port to listen on. 0 picks a free one.',
+                        default=8000,
+                        type=int)
+
+    parser.add_argument('--max_batch_size',
+                        dest='max_batch_size',
+                        help='Maximum number of requests run together.',
+                        default=32,
+                        type=int)
+
+    parser.add_argument('--max_wait_ms',
+                        dest='max_wait_ms',
+                        help='Maximum time to wait for more requests'
+                        ' after the first one of a batch, in ms.',
+                        default=5.0,
+                        type=float)
+
+    parser.add_argument('--max_target_seq_len',
+                        dest='max_target_seq_len',
+                        help='Maximum number of poses a request can ask'
+                        ' for.',
+                        default=1000,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def serve_parser_from_dict(dict_args):
+    """Build prediction server parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'checkpoint': None,
+        'stats': '',
+        'host': '127.0.0.1',
+        'port': 8000,
+        'max_batch_size': 32,
+        'max_wait_ms': 5.0,
+        'max_target_seq_len': 1000,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def client_parser():
+    """Argument parser for the client of the prediction server.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Send concurrent requests to the prediction server')
+
+    parser.add_argument('--url',
+                        dest='url',
+                        help='Address of the server.',
+                        default='http://127.0.0.1:8000',
+                        type=str)
+
+    parser.add_argument('--requests',
+                        dest='requests',
+                        help='Number of requests to send.',
+                        default=200,
+                        type=int)
+
+    parser.add_argument('--concurrency',
+                        dest='concurrency',
+                        help='Number of requests in flight at once.',
+                        default=16,
+                        type=int)
+
+    parser.add_argument('--seq_length_in',
+                        dest='seq_length_in',
+                        help='Number of frames of every seed. 25 fps',
+                        default=50,
+                        type=int)
+
+    parser.add_argument('--seq_length_out',
+                        dest='seq_length_out',
+                        help='Number of frames to predict. 25 fps',
+                        default=25,
+                        type=int)
+
+    parser.add_argument('--action',
+                        dest='action',
+                        help='The action of the seeds.',
+                        default='walking',
+                        type=str)
+
+    parser.add_argument('--data_dir',
+                        dest='data_dir',
+                        help='Data directory',
+                        default=os.path.normpath("./data/h3.6m/dataset"),
+                        type=str)
+
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the'
+                        ' parsed sequences. Empty disables it.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--seed',
+                        dest='seed',
+                        help='Seed to draw the seeds from the sequences.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def client_parser_from_dict(dict_args):
+    """Build client parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'url': 'http://127.0.0.1:8000',
+        'requests': 200,
+        'concurrency': 16,
+        'seq_length_in': 50,
+        'seq_length_out': 25,
+        'action': 'walking',
+        'data_dir': os.path.normpath('./data/h3.6m/dataset'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'seed': 0,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def stream_server_parser():
+    """Argument parser for the stream server.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Serve rolling forecasts of streams of frames')
+
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        help='Path to the saved model, e.g.'
+                        ' <train_dir>/model_1000.',
+                        required=True,
+                        type=str)
+
+    parser.add_argument('--stats',
+                        dest='stats',
+                        help='Path to the normalization stats. Empty uses'
+                        ' the ones saved next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--host',
+                        dest='host',
+                        help='Address to listen on.',
+                        default='127.0.0.1',
+                        type=str)
+
+    parser.add_argument('--port',
+                        dest='port',
+                        help='Port to listen on. 0 picks a free one.',
+                        default=8001,
+                        type=int)
+
+    parser.add_argument('--max_pending',
+                        dest='max_pending',
+                        help='Maximum number of frames waiting for the'
+                        ' model, and of forecasts waiting to be sent,'
+                        ' per stream.',
+                        default=8,
+                        type=int)
+
+    parser.add_argument('--max_wait_ms',
+                        dest='max_wait_ms',
+                        help='Time to wait for frames of other streams'
+                        ' after the first one of a tick, in ms.',
+                        default=2.0,
+                        type=float)
+
+    parser.add_argument('--max_streams',
+                        dest='max_streams',
+                        help='Maximum number of open streams.',
+                        default=256,
+                        type=int)
+
+    parser.add_argument('--max_target_seq_len',
+                        dest='max_target_seq_len',
+                        help='Maximum number of poses a stream can ask for.',
+                        default=1000,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def stream_server_parser_from_dict(dict_args):
+    """Build stream server parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'checkpoint': None,
+        'stats': '',
+        'host': '127.0.0.1',
+        'port': 8001,
+        'max_pending': 8,
+        'max_wait_ms': 2.0,
+        'max_streams': 256,
+        'max_target_seq_len': 1000,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def simulation_parser():
+    """Argument parser for the simulation of streams.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Simulate streams against a local stream server')
+
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        help='Path to the saved model, e.g.'
+                        ' <train_dir>/model_1000.',
+                        required=True,
+                        type=str)
+
+    parser.add_argument('--stats',
+                        dest='stats',
+                        help='Path to the normalization stats. Empty uses'
+                        ' the ones saved next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--streams',
+                        dest='streams',
+                        help='Number of concurrent streams.',
+                        default=64,
+                        type=int)
+
+    parser.add_argument('--frames',
+                        dest='frames',
+                        help='Number of frames sent by every stream.',
+                        default=100,
+                        type=int)
+
+    parser.add_argument('--fps',
+                        dest='fps',
+                        help='Frames sent per second by every stream. 0'
+                        ' sends as fast as possible.',
+                        default=25.0,
+                        type=float)
+
+    parser.add_argument('--seq_length_out',
+                        dest='seq_length_out',
+                        help='Number of frames of every forecast. 25 fps',
+                        default=25,
+                        type=int)
+
+    parser.add_argument('--forecast_every',
+                        dest='forecast_every',
+                        help='Number of frames between forecasts.',
+                        default=1,
+                        type=int)
+
+    parser.add_argument('--action',
+                        dest='action',
+                        help='The action of the streams, or all to draw'
+                        ' them from all the actions of the model.',
+                        default='all',
+                        type=str)
+
+    parser.add_argument('--encoding',
+                        dest='encoding',
+                        help='How the server encodes the forecasts.',
+                        choices=['json', 'base64'],
+                        default='base64',
+                        type=str)
+
+    parser.add_argument('--slow_streams',
+                        dest='slow_streams',
+                        help='Number of streams reading their forecasts'
+                        ' slowly.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--slow_read_ms',
+                        dest='slow_read_ms',
+                        help='Time the slow streams wait before reading'
+                        ' each forecast, in ms.',
+                        default=200.0,
+                        type=float)
+
+    parser.add_argument('--max_pending',
+                        dest='max_pending',
+                        help='Maximum number of frames waiting for the'
+                        ' model, and of forecasts waiting to be sent,'
+                        ' per stream.',
+                        default=8,
+                        type=int)
+
+    parser.add_argument('--max_wait_ms',
+                        dest='max_wait_ms',
+                        help='Time to wait for frames of other streams'
+                        ' after the first one of a tick, in ms.',
+                        default=2.0,
+                        type=float)
+
+    parser.add_argument('--data_dir',
+                        dest='data_dir',
+                        help='Data directory',
+                        default=os.path.normpath("./data/h3.6m/dataset"),
+                        type=str)
+
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the parsed'
+                        ' sequences. Empty disables it.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--seed',
+                        dest='seed',
+                        help='Seed to draw the frames from the sequences.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def simulation_parser_from_dict(dict_args):
+    """Build simulation parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'checkpoint': None,
+        'stats': '',
+        'streams': 64,
+        'frames': 100,
+        'fps': 25.0,
+        'seq_length_out': 25,
+        'forecast_every': 1,
+        'action': 'all',
+        'encoding': 'base64',
+        'slow_streams': 0,
+        'slow_read_ms': 200.0,
+        'max_pending': 8,
+        'max_wait_ms': 2.0,
+        'data_dir': os.path.normpath('./data/h3.6m/dataset'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'seed': 0,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def export_parser():
+    """Argument parser for the export of a model.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Export a trained model for inference')
+
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        help='Path to the saved model, e.g.'
+                        ' <train_dir>/model_1000.',
+                        required=True,
+                        type=str)
+
+    parser.add_argument('--stats',
+                        dest='stats',
+                        help='Path to the normalization stats. Empty uses'
+                        ' the ones saved next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--output',
+                        dest='output',
+                        help='Path of the archive. Empty writes it next'
+                        ' to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--method',
+                        dest='method',
+                        help='trace for TorchScript, export for'
+                        ' torch.export.',
+                        choices=['trace', 'export'],
+                        default='trace',
+                        type=str)
+
+    parser.add_argument('--seq_length_in',
+                        dest='seq_length_in',
+                        help='Number of frames of the seeds. 25 fps',
+                        default=50,
+                        type=int)
+
+    parser.add_argument('--seq_length_out',
+                        dest='seq_length_out',
+                        help='Number of frames to predict. 25 fps',
+                        default=25,
+                        type=int)
+
+    parser.add_argument('--batch_size',
+                        dest='batch_size',
+                        help='Batch size of the check and timing.',
+                        default=8,
+                        type=int)
+
+    parser.add_argument('--repeats',
+                        dest='repeats',
+                        help='Number of timed predictions.',
+                        default=50,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def export_parser_from_dict(dict_args):
+    """Build export parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'checkpoint': None,
+        'stats': '',
+        'output': '',
+        'method': 'trace',
+        'seq_length_in': 50,
+        'seq_length_out': 25,
+        'batch_size': 8,
+        'repeats': 50,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
+def quantize_parser():
+    """Argument parser for the quantization of a model.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    parser = argparse.ArgumentParser(
+        description='Quantize a trained model to int8 and evaluate it')
+
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        help='Path to the saved model, e.g.'
+                        ' <train_dir>/model_1000.',
+                        required=True,
+                        type=str)
+
+    parser.add_argument('--stats',
+                        dest='stats',
+                        help='Path to the normalization stats. Empty uses'
+                        ' the ones saved next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--output',
+                        dest='output',
+                        help='Path of the quantized model. Empty writes it'
+                        ' next to the checkpoint.',
+                        default='',
+                        type=str)
+
+    parser.add_argument('--seq_length_out',
+                        dest='seq_length_out',
+                        help='Number of frames to predict. 25 fps',
+                        default=100,
+                        type=int)
+
+    parser.add_argument('--repeats',
+                        dest='repeats',
+                        help='Number of timed forward passes.',
+                        default=20,
+                        type=int)
+
+    parser.add_argument('--data_dir',
+                        dest='data_dir',
+                        help='Data directory',
+                        default=os.path.normpath("./data/h3.6m/dataset"),
+                        type=str)
+
+    parser.add_argument('--cache_dir',
+                        dest='cache_dir',
+                        help='Directory with the binary cache of the'
+                        ' parsed sequences. Empty disables it.',
+                        default=os.path.normpath("./data/h3.6m/cache"),
+                        type=str)
+
+    parser.add_argument('--load_workers',
+                        dest='load_workers',
+                        help='Number of processes reading the data files.'
+                        ' 0 reads them in the main process.',
+                        default=0,
+                        type=int)
+
+    parser.add_argument('--log-level',
+                        dest='log_level',
+                        type=int,
+                        default=20,
+                        help='Log level (default: 20)')
+
+    args = parser.parse_args()
+    return args
+
+
+def quantize_parser_from_dict(dict_args):
+    """Build quantization parser from a dictionary.
+
+    Parameters
+    ----------
+    dict_args : dict
+        Dictionary with the arguments.
+
+    Returns
+    -------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    default_params = {
+        'checkpoint': None,
+        'stats': '',
+        'output': '',
+        'seq_length_out': 100,
+        'repeats': 20,
+        'data_dir': os.path.normpath('./data/h3.6m/dataset'),
+        'cache_dir': os.path.normpath('./data/h3.6m/cache'),
+        'load_workers': 0,
+        'log_level': 20,
+    }
+
+    default_params.update(dict_args)
+    args = Namespace(**default_params)
+
+    return args
+
+
 def animation_parser():
     """Argument parser for animation script.
 
@@ -0,0 +1,146 @@
+"""Quantize a trained model to int8, and compare its accuracy and speed
+with the float model."""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import quantize_parser
+    from models.predictor import Predictor
+    from models.quantization import quantize_model
+    from models.quantization import serialized_size
+    from utils.data_utils import read_test_data
+    from utils.sampling import WindowSampler
+    from utils.torch_evaluation import evaluate_batch
+else:
+    from src.models.predictor import Predictor
+    from src.models.quantization import quantize_model
+    from src.models.quantization import serialized_size
+    from src.utils.data_utils import read_test_data
+    from src.utils.sampling import WindowSampler
+    from src.utils.torch_evaluation import evaluate_batch
+
+
+def time_forward(predictor, encoder_inputs, decoder_inputs, repeats):
+    """Median time of a forward pass, in ms, after a warm up."""
+
+    predictor.forward(encoder_inputs, decoder_inputs)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictor.forward(encoder_inputs, decoder_inputs)
+        times.append(time.perf_counter() - start)
+
+    return 1e3 * np.median(times)
+
+
+def quantize(args):
+    """Quantize a checkpoint, save it, and report the Euler angle error on
+    the SRNN seeds and the speed of both models.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    # Quantized kernels only run on the CPU
+    device = torch.device('cpu')
+    predictor = Predictor.load(args.checkpoint, args.stats or None, device)
+    quantized = Predictor(quantize_model(predictor.model),
+                          predictor.data_mean, predictor.data_std,
+                          predictor.dim_to_ignore, predictor.dim_to_use,
+                          predictor.actions, device)
+
+    output = args.output or args.checkpoint + '_int8'
+    # Saved as a whole module, as train.py does, so Predictor.load reads it
+    torch.save(quantized.model, output)
+    logging.info(f'Saved the quantized model to {output}')
+    if os.path.dirname(os.path.abspath(output)) != os.path.dirname(
+            os.path.abspath(args.checkpoint)):
+        logging.warning('The normalization stats are not next to the'
+                        ' quantized model, pass them to Predictor.load')
+
+    actions = predictor.actions
+    test_set = read_test_data(actions, args.data_dir, predictor.data_mean,
+                              predictor.data_std, predictor.dim_to_use,
+                              args.cache_dir, args.load_workers)
+    test_sampler = WindowSampler(test_set, actions)
+
+    data_mean = torch.from_numpy(predictor.data_mean)
+    data_std = torch.from_numpy(predictor.data_std)
+    dim_to_use = torch.as_tensor(predictor.dim_to_use)
+
+    # The SRNN seeds of every action, as test.py uses them
+    model = predictor.model
+    model.source_seq_len = 50
+    model.target_seq_len = args.seq_length_out
+    batches = {
+        action: model.get_batch_srnn(test_sampler, action, device)
+        for action in actions
+    }
+
+    horizons = [
+        step for step in [1, 3, 7, 9, 13, 24] if step < args.seq_length_out
+    ]
+    errors = {}
+    for name, p in [('float', predictor), ('int8', quantized)]:
+        errors[name] = {}
+        for action, (encoder_inputs, decoder_inputs, targets) in \
+                batches.items():
+            preds = p.forward(encoder_inputs, decoder_inputs)
+            errors[name][action] = evaluate_batch(preds, targets, data_mean,
+                                                  data_std,
+                                                  dim_to_use).numpy()
+
+    print('Euler error (ms):         ' +
+          ' '.join(f'{(step + 1) * 40:>6}' for step in horizons))
+    for action in actions:
+        for name in ['float', 'int8']:
+            print(f'{action:<16}{name:>6}   ' + ' '.join(
+                f'{errors[name][action][step]:6.3f}' for step in horizons))
+    mean_errors = {
+        name: np.mean([errors[name][action] for action in actions], 0)
+        for name in ['float', 'int8']
+    }
+    for name in ['float', 'int8']:
+        print(f'{"mean":<16}{name:>6}   ' + ' '.join(
+            f'{mean_errors[name][step]:6.3f}' for step in horizons))
+    print(f'{"mean int8 - float":<22}   ' + ' '.join(
+        f'{mean_errors["int8"][step] - mean_errors["float"][step]:+6.3f}'
+        for step in horizons))
+
+    print(f'\nSize of the weights: float'
+          f' {serialized_size(predictor.model) / 1024:.1f} KiB, int8'
+          f' {serialized_size(quantized.model) / 1024:.1f} KiB')
+
+    # Speed on one seed, and on the seeds of all the actions together
+    encoder_inputs = torch.cat([batch[0] for batch in batches.values()])
+    decoder_inputs = torch.cat([batch[1] for batch in batches.values()])
+    for batch_size in [1, encoder_inputs.shape[0]]:
+        times = {
+            name: time_forward(p, encoder_inputs[:batch_size],
+                               decoder_inputs[:batch_size], args.repeats)
+            for name, p in [('float', predictor), ('int8', quantized)]
+        }
+        print(f'Batch of {batch_size}: float {times["float"]:.2f} ms, int8'
+              f' {times["int8"]:.2f} ms'
+              f' ({times["float"] / times["int8"]:.2f}x)')
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = quantize_parser()
+
+    # Quantization function
+    quantize(args)
@@ -0,0 +1,194 @@
+"""Local HTTP server answering prediction requests in dynamic batches."""
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+import logging
+import sys
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import serve_parser
+    from models.predictor import Predictor
+    from utils.batching import DynamicBatcher
+    from utils.forward_kinematics import fkl_batch
+else:
+    from src.models.predictor import Predictor
+    from src.utils.batching import DynamicBatcher
+    from src.utils.forward_kinematics import fkl_batch
+
+
+def parse_request(body, predictor, max_target_seq_len):
+    """Check a JSON prediction request.
+
+    Parameters
+    ----------
+    body: bytes
+        JSON object with the `seeds` (seed_len x 99 list of lists), the
+        `action`, and optionally `target_seq_len` and `xyz`.
+    predictor: Predictor
+        Predictor the request is for.
+    max_target_seq_len: int
+        Maximum number of poses a request can ask for.
+
+    Returns
+    -------
+    request: dict
+        The seeds as a np.array, the action, target_seq_len and xyz.
+    """
+
+    try:
+        request = json.loads(body)
+        seeds = np.array(request['seeds'], dtype=np.float64)
+        action = request['action']
+        target_seq_len = int(
+            request.get('target_seq_len', predictor.model.target_seq_len))
+        xyz = bool(request.get('xyz', False))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'Malformed request: {e}') from None
+
+    if seeds.ndim != 2 or seeds.shape[0] < 2 or seeds.shape[1] != 99:
+        raise ValueError('seeds must be a list of at least 2 poses of 99'
+                         f' values, got shape {seeds.shape}')
+    if action not in predictor.actions:
+        raise ValueError(f'Model was not trained on action {action}')
+    if not 0 < target_seq_len <= max_target_seq_len:
+        raise ValueError(f'target_seq_len must be in [1,'
+                         f' {max_target_seq_len}]')
+
+    return {
+        'seeds': seeds,
+        'action': action,
+        'target_seq_len': target_seq_len,
+        'xyz': xyz
+    }
+
+
+def predict_batch(predictor, requests):
+    """Run a batch of requests, grouped by seed and target lengths.
+
+    Parameters
+    ----------
+    predictor: Predictor
+        Predictor to run the requests on.
+    requests: list
+        Requests checked by `parse_request`.
+
+    Returns
+    -------
+    results: list
+        Dictionary with the predicted `poses`, and their `xyz` points if
+        asked for, of every request.
+    """
+
+    groups = {}
+    for i, request in enumerate(requests):
+        key = (request['seeds'].shape[0], request['target_seq_len'])
+        groups.setdefault(key, []).append(i)
+
+    results = [None] * len(requests)
+    for (_, target_seq_len), indices in groups.items():
+        poses = predictor.predict(
+            np.stack([requests[i]['seeds'] for i in indices]),
+            [requests[i]['action'] for i in indices], target_seq_len)
+        for i, pose in zip(indices, poses):
+            results[i] = {'poses': pose.tolist()}
+            if requests[i]['xyz']:
+                results[i]['xyz'] = fkl_batch(pose).tolist()
+
+    return results
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """Handler of the requests: POST /predict and GET /metrics."""
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self._send(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        self._send(200, self.server.batcher.metrics())
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            request = parse_request(body, self.server.predictor,
+                                    self.server.max_target_seq_len)
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        try:
+            result = self.server.batcher.submit(request).result()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.exception('Prediction failed')
+            self._send(500, {'error': str(e)})
+            return
+
+        self._send(200, result)
+
+    def _send(self, status, content):
+        """Send a JSON response."""
+
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(format % args)
+
+
+def serve(args):
+    """Load a model and answer prediction requests until interrupted.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    predictor = Predictor.load(args.checkpoint, args.stats or None)
+
+    # Warm up the model, so the first request does not pay for it
+    predictor.predict(np.zeros((2, 99)), predictor.actions[0], 1)
+
+    batcher = DynamicBatcher(
+        lambda requests: predict_batch(predictor, requests),
+        args.max_batch_size, args.max_wait_ms / 1e3)
+
+    server = ThreadingHTTPServer((args.host, args.port), PredictionHandler)
+    server.daemon_threads = True
+    server.predictor = predictor
+    server.batcher = batcher
+    server.max_target_seq_len = args.max_target_seq_len
+
+    logging.info(f'Serving {args.checkpoint} on'
+                 f' http://{args.host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = serve_parser()
+
+    # Serving function
+    serve(args)
@@ -0,0 +1,243 @@
+"""Local simulation of many concurrent clients of the stream server."""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import simulation_parser
+    from models.streaming import StreamingPredictor
+    from stream_server import StreamHub
+    from stream_server import decode_forecast
+    from stream_server import encode_message
+    from stream_server import start_server
+    from utils.data_utils import load_data
+    from utils.data_utils import TEST_SUBJECT_IDS
+else:
+    from src.models.streaming import StreamingPredictor
+    from src.stream_server import StreamHub
+    from src.stream_server import decode_forecast
+    from src.stream_server import encode_message
+    from src.stream_server import start_server
+    from src.utils.data_utils import load_data
+    from src.utils.data_utils import TEST_SUBJECT_IDS
+
+
+async def run_stream(host,
+                     port,
+                     frames,
+                     action,
+                     fps,
+                     target_seq_len,
+                     forecast_every,
+                     encoding='json',
+                     read_delay=0.0):
+    """Send frames to the stream server at a fixed rate, and collect the
+    forecasts.
+
+    Parameters
+    ----------
+    host: str
+        Address of the server.
+    port: int
+        Port of the server.
+    frames: np.array
+        (n_frames, 99) exponential map poses to send.
+    action: str
+        The action of the frames.
+    fps: float
+        Frames sent per second; as fast as possible if 0.
+    target_seq_len: int
+        Number of poses of the forecasts.
+    forecast_every: int
+        Number of frames between forecasts.
+    encoding: str
+        How the server encodes the forecasts, one of `ENCODINGS`.
+    read_delay: float
+        Seconds to wait before reading each forecast, to simulate a slow
+        client.
+
+    Returns
+    -------
+    forecasts: dict
+        The poses of every forecast, as a np.array, by number of frames.
+    latencies: list
+        Seconds from sending a frame to getting its forecast.
+    """
+
+    reader, writer = await asyncio.open_connection(host, port, limit=2**24)
+    writer.write(encode_message({
+        'action': action,
+        'target_seq_len': target_seq_len,
+        'forecast_every': forecast_every,
+        'encoding': encoding
+    }))
+    reply = json.loads(await reader.readline())
+    if 'error' in reply:
+        raise ValueError(reply['error'])
+
+    sent = []
+    forecasts = {}
+    latencies = []
+    n_forecasts = len(frames) // forecast_every
+
+    async def receive():
+        while len(forecasts) < n_forecasts:
+            if read_delay > 0:
+                await asyncio.sleep(read_delay)
+            message = json.loads(await reader.readline())
+            if 'error' in message:
+                raise ValueError(message['error'])
+            latencies.append(time.perf_counter() - sent[message['frame'] - 1])
+            forecasts[message['frame']] = decode_forecast(message)
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        if fps > 0:
+            # Keep to the schedule, whatever the time spent waiting
+            await asyncio.sleep(max(0.0, start + i / fps - time.perf_counter()))
+        sent.append(time.perf_counter())
+        writer.write(encode_message({'frame': frame.tolist()}))
+        # Waits while the server does not read, i.e. under backpressure
+        await writer.drain()
+
+    await receiver
+    writer.close()
+    await writer.wait_closed()
+
+    return forecasts, latencies
+
+
+async def simulate_streams(args, streaming, sequences):
+    """Run the server and the simulated streams in this event loop.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    streaming: StreamingPredictor
+        Predictor to serve.
+    sequences: list
+        (action, sequence) pairs to draw the frames from.
+
+    Returns
+    -------
+    frames: list
+        The frames sent by every stream.
+    actions: list
+        The action of every stream.
+    results: list
+        The forecasts and latencies of every stream, see `run_stream`.
+    metrics: dict
+        The metrics of the server at the end.
+    elapsed: float
+        Seconds the streams took.
+    """
+
+    hub = StreamHub(streaming, args.max_pending, args.max_wait_ms / 1e3,
+                    args.streams, args.seq_length_out)
+    inference = asyncio.create_task(hub.run())
+    server = await start_server(hub)
+    port = server.sockets[0].getsockname()[1]
+
+    rng = np.random.RandomState(args.seed)
+    frames = []
+    actions = []
+    for _ in range(args.streams):
+        action, sequence = sequences[rng.randint(len(sequences))]
+        start = rng.randint(sequence.shape[0] - args.frames)
+        frames.append(sequence[start:start + args.frames])
+        actions.append(action)
+
+    async def stream(i):
+        # Spread the streams over the period of a frame
+        if args.fps > 0:
+            await asyncio.sleep(rng.uniform(0, 1 / args.fps))
+        read_delay = args.slow_read_ms / 1e3 if i < args.slow_streams else 0.0
+        return await run_stream('127.0.0.1', port, frames[i], actions[i],
+                                args.fps, args.seq_length_out,
+                                args.forecast_every, args.encoding,
+                                read_delay)
+
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *[stream(i) for i in range(args.streams)])
+    finally:
+        elapsed = time.perf_counter() - start
+        server.close()
+        await server.wait_closed()
+        await hub.wait_closed()
+        inference.cancel()
+        hub.shutdown()
+
+    return frames, actions, results, hub.metrics(), elapsed
+
+
+def simulate(args):
+    """Simulate concurrent streams against a local stream server, report
+    the latencies, and check the forecasts of a stream against
+    `Predictor.predict`.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    if args.slow_streams >= args.streams:
+        raise ValueError('At least one stream must read at full speed')
+
+    streaming = StreamingPredictor.load(args.checkpoint, args.stats or None)
+    actions = streaming.predictor.actions
+    if args.action != 'all':
+        actions = [args.action]
+    data, _ = load_data(args.data_dir, TEST_SUBJECT_IDS, actions,
+                        args.cache_dir)
+    sequences = [(key[1], sequence) for key, sequence in data.items()
+                 if sequence.shape[0] > args.frames]
+    if not sequences:
+        raise ValueError(f'No test sequence is longer than {args.frames}'
+                         ' frames')
+
+    frames, actions, results, metrics, elapsed = asyncio.run(
+        simulate_streams(args, streaming, sequences))
+
+    n_frames = args.streams * args.frames
+    n_forecasts = sum(len(forecasts) for forecasts, _ in results)
+    latencies = 1e3 * np.concatenate(
+        [latencies for _, latencies in results[args.slow_streams:]])
+    print(f'{args.streams} streams sent {n_frames} frames in {elapsed:.2f} s'
+          f' ({n_frames / elapsed:.1f} frames/s), and got {n_forecasts}'
+          ' forecasts')
+    print('Frame to forecast latency of the fast streams (ms): ' +
+          ', '.join(f'p{p} {np.percentile(latencies, p):.1f}'
+                    for p in [50, 90, 99]))
+    print('Server metrics: ' + json.dumps(metrics, indent=2))
+
+    # The stateful forecasts match a prediction from the whole history
+    forecasts, _ = results[-1]
+    length = max(forecasts)
+    poses = streaming.predictor.predict(frames[-1][:length], actions[-1],
+                                        args.seq_length_out)
+    print('Max difference of the last forecast of a stream with'
+          f' Predictor.predict: {np.abs(forecasts[length] - poses).max():.2e},'
+          f' for poses up to {np.abs(poses).max():.2e}')
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = simulation_parser()
+
+    # Simulation function
+    simulate(args)
@@ -0,0 +1,592 @@
+"""Asyncio server taking streams of frames and sending rolling forecasts.
+
+Every connection is one stream of newline-delimited JSON messages. The
+client first sends `{"action": ..., "target_seq_len": ..., "forecast_every":
+..., "encoding": ...}` and gets `{"stream": <id>}` back, or `{"metrics":
+true}` to get the metrics of the server. It then sends `{"frame": [99
+values]}` messages, and gets `{"frame": <n>, "poses": [[99 values], ...]}`
+every `forecast_every` frames, with the poses following its first n frames.
+With the base64 encoding, the poses are sent as `"poses_base64"`, the
+base64 of their little-endian float32 values, which is much cheaper to
+encode and decode than JSON numbers. Malformed messages get an `{"error":
+...}` answer, and the connection is closed. When the client closes its
+side, the forecasts of its last frames are sent before closing.
+"""
+
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import functools
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from parsers import stream_server_parser
+    from models.streaming import StreamingPredictor
+    from utils.batching import add_percentiles
+else:
+    from src.models.streaming import StreamingPredictor
+    from src.utils.batching import add_percentiles
+
+
+ENCODINGS = ['json', 'base64']
+
+
+def encode_message(content):
+    """Encode a message as a line of JSON."""
+
+    return json.dumps(content).encode() + b'\n'
+
+
+def encode_forecast(length, poses, encoding='json'):
+    """Encode a forecast message.
+
+    Parameters
+    ----------
+    length: int
+        Number of frames of the stream the forecast follows.
+    poses: np.array
+        (target_seq_len, 99) predicted poses.
+    encoding: str
+        How to encode the poses, one of `ENCODINGS`.
+
+    Returns
+    -------
+    message: bytes
+        The encoded message.
+    """
+
+    if encoding == 'base64':
+        return encode_message({
+            'frame': length,
+            'poses_base64': base64.b64encode(
+                poses.astype('<f4').tobytes()).decode()
+        })
+
+    return encode_message({'frame': length, 'poses': poses.tolist()})
+
+
+def decode_forecast(message):
+    """Decode a forecast message, in either encoding.
+
+    Parameters
+    ----------
+    message: dict
+        The parsed JSON of the message.
+
+    Returns
+    -------
+    poses: np.array
+        (target_seq_len, 99) predicted poses.
+    """
+
+    if 'poses_base64' in message:
+        return np.frombuffer(base64.b64decode(message['poses_base64']),
+                             dtype='<f4').reshape(-1, 99)
+
+    return np.array(message['poses'])
+
+
+class Session(object):
+    """A stream of a client, with its queues of frames and forecasts."""
+
+    def __init__(self, handle, action, target_seq_len, forecast_every,
+                 encoding, max_pending):
+        self.handle = handle
+        self.action = action
+        self.target_seq_len = target_seq_len
+        self.forecast_every = forecast_every
+        self.encoding = encoding
+        self.length = 0
+        self.closed = False
+        # Frames waiting for the encoder, with their arrival times
+        self.frames = asyncio.Queue(max_pending)
+        # Encoded forecasts waiting to be sent
+        self.forecasts = asyncio.Queue(max_pending)
+
+
+class StreamHub(object):
+    """Runs the streams of many clients on a `StreamingPredictor`.
+
+    A single inference task batches the streams with a pending frame every
+    tick: it pushes one frame of each through the encoder together, then
+    forecasts the ones due, in one call per target length. The model runs
+    in a worker thread, so the event loop keeps reading and writing while it
+    computes; every call to the `StreamingPredictor` goes through that one
+    thread, in order.
+
+    Backpressure is per stream. At most `max_pending` frames wait for the
+    encoder; pushing more waits, so a fast client stops being read. A stream
+    with `max_pending` forecasts not yet sent does not take part in ticks
+    until its client reads them, so a slow reader slows down its own stream
+    only.
+    """
+
+    def __init__(self,
+                 streaming,
+                 max_pending=8,
+                 max_wait=0.002,
+                 max_streams=256,
+                 max_target_seq_len=1000,
+                 history=10000):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        streaming: StreamingPredictor
+            Predictor keeping the state of the streams.
+        max_pending: int
+            Maximum number of frames waiting for the encoder, and of
+            forecasts waiting to be sent, per stream.
+        max_wait: float
+            Time, in seconds, to wait for frames of other streams after
+            the first one of a tick.
+        max_streams: int
+            Maximum number of open streams.
+        max_target_seq_len: int
+            Maximum number of poses a stream can ask for.
+        history: int
+            Number of ticks and forecasts kept for the metrics.
+        """
+
+        self.streaming = streaming
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self.max_streams = max_streams
+        self.max_target_seq_len = max_target_seq_len
+
+        self.executor = ThreadPoolExecutor(1)
+        self.sessions = {}
+        # Streams being opened in the worker, counted against max_streams
+        self.n_opening = 0
+        # Tasks serving the connections, to wait for them on shutdown
+        self.connections = set()
+        self.wakeup = asyncio.Event()
+
+        self.batch_sizes = collections.deque(maxlen=history)
+        self.step_times = collections.deque(maxlen=history)
+        self.latencies = collections.deque(maxlen=history)
+        self.n_ticks = 0
+        self.n_frames = 0
+        self.n_forecasts = 0
+        self.n_errors = 0
+
+    async def _call(self, function, *args):
+        """Run a function in the worker thread."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def open(self,
+                   action,
+                   target_seq_len,
+                   forecast_every=1,
+                   encoding='json'):
+        """Open a stream.
+
+        Parameters
+        ----------
+        action: str
+            The action of the stream.
+        target_seq_len: int
+            Number of poses of the forecasts.
+        forecast_every: int
+            Number of frames between forecasts.
+        encoding: str
+            How to encode the forecasts, one of `ENCODINGS`.
+
+        Returns
+        -------
+        session: Session
+            The new stream.
+        """
+
+        if len(self.sessions) + self.n_opening >= self.max_streams:
+            raise ValueError(f'Too many streams, at most {self.max_streams}')
+        if not 0 < target_seq_len <= self.max_target_seq_len:
+            raise ValueError(f'target_seq_len must be in [1,'
+                             f' {self.max_target_seq_len}]')
+        if forecast_every < 1:
+            raise ValueError('forecast_every must be at least 1')
+        if encoding not in ENCODINGS:
+            raise ValueError(f'encoding must be one of {ENCODINGS}')
+
+        # Reserve the slot now, as other streams may open during the call
+        self.n_opening += 1
+        try:
+            handle = await self._call(self.streaming.open, action)
+        finally:
+            self.n_opening -= 1
+        session = Session(handle, action, target_seq_len, forecast_every,
+                          encoding, self.max_pending)
+        self.sessions[handle] = session
+
+        return session
+
+    async def close(self, session):
+        """Close a stream, dropping its pending frames and forecasts.
+
+        Parameters
+        ----------
+        session: Session
+            The stream.
+        """
+
+        if session.closed:
+            return
+        # Closed sessions are skipped by the next ticks, and the worker
+        # runs the close after any tick the stream is already in
+        session.closed = True
+        del self.sessions[session.handle]
+        await self._call(self.streaming.close, session.handle)
+
+    async def push(self, session, frame):
+        """Queue a frame of a stream, waiting while the queue is full.
+
+        Parameters
+        ----------
+        session: Session
+            The stream.
+        frame: np.array
+            The new 99-long exponential map pose.
+        """
+
+        frame = np.asarray(frame, dtype=np.float64)
+        if frame.shape != (99,) or not np.isfinite(frame).all():
+            raise ValueError('A frame must be a list of 99 finite values')
+        if session.closed:
+            raise ValueError(f'Stream {session.handle} is closed')
+
+        await session.frames.put((frame, time.perf_counter()))
+        self.wakeup.set()
+
+    async def next_forecast(self, session):
+        """Wait for the next message to send to a stream's client.
+
+        Parameters
+        ----------
+        session: Session
+            The stream.
+
+        Returns
+        -------
+        message: bytes
+            The encoded forecast or error.
+        """
+
+        message = await session.forecasts.get()
+        # The stream may have been left out of ticks for lack of room
+        self.wakeup.set()
+
+        return message
+
+    async def flush(self, session):
+        """Wait for the frames of a stream to go through the model, and for
+        its forecasts to be sent, i.e. marked done on `session.forecasts`.
+
+        Parameters
+        ----------
+        session: Session
+            The stream.
+        """
+
+        await session.frames.join()
+        await session.forecasts.join()
+
+    async def run(self):
+        """Inference task, running ticks until cancelled."""
+
+        backlog = False
+        while True:
+            if not backlog:
+                await self.wakeup.wait()
+                if self.max_wait > 0:
+                    await asyncio.sleep(self.max_wait)
+            self.wakeup.clear()
+
+            batch = [
+                s for s in self.sessions.values()
+                if not s.frames.empty() and not s.forecasts.full()
+            ]
+            if batch:
+                await self._tick(batch)
+
+            backlog = any(not s.frames.empty() and not s.forecasts.full()
+                          for s in self.sessions.values())
+
+    async def _tick(self, batch):
+        """Push a frame of every stream of a batch, and send the forecasts
+        that are due."""
+
+        frames, arrivals = zip(*[s.frames.get_nowait() for s in batch])
+
+        start = time.perf_counter()
+        try:
+            messages = await self._call(self._step, batch, np.stack(frames))
+        except Exception as e:  # pylint: disable=broad-except
+            logging.exception('Tick failed')
+            self.n_errors += len(batch)
+            for session in batch:
+                session.forecasts.put_nowait(encode_message({'error': str(e)}))
+                session.frames.task_done()
+            return
+        end = time.perf_counter()
+
+        self.n_ticks += 1
+        self.n_frames += len(batch)
+        self.n_forecasts += len(messages)
+        self.batch_sizes.append(len(batch))
+        self.step_times.append(end - start)
+        for session, arrival in zip(batch, arrivals):
+            if session.handle in messages:
+                self.latencies.append(end - arrival)
+                # Streams with a full queue were left out of the batch
+                session.forecasts.put_nowait(messages[session.handle])
+            session.frames.task_done()
+
+    def _step(self, batch, frames):
+        """Push frames and encode forecasts, in the worker thread."""
+
+        self.streaming.push([s.handle for s in batch], frames)
+
+        # Counted once the push went through, so that the lengths match the
+        # states of the streams even if a forecast fails
+        groups = {}
+        for session in batch:
+            session.length += 1
+            if session.length % session.forecast_every == 0:
+                groups.setdefault(session.target_seq_len, []).append(session)
+
+        messages = {}
+        for target_seq_len, group in groups.items():
+            poses = self.streaming.forecast([s.handle for s in group],
+                                            target_seq_len)
+            for session, pose in zip(group, poses):
+                messages[session.handle] = encode_forecast(
+                    session.length, pose, session.encoding)
+
+        return messages
+
+    def metrics(self):
+        """Counters, and percentiles over the last ticks and forecasts.
+
+        Returns
+        -------
+        metrics: dict
+            Number of open streams, ticks, frames, forecasts and errors,
+            mean batch size, and the 50th, 90th and 99th percentiles of the
+            batch size, of the time of a tick in the model, and of the
+            latency from the arrival of a frame to its forecast, both in ms.
+        """
+
+        batch_sizes = np.array(self.batch_sizes)
+        metrics = {
+            'streams': len(self.sessions),
+            'ticks': self.n_ticks,
+            'frames': self.n_frames,
+            'forecasts': self.n_forecasts,
+            'errors': self.n_errors,
+        }
+        add_percentiles(metrics, 'batch_size', batch_sizes)
+        add_percentiles(metrics, 'step_ms', 1e3 * np.array(self.step_times))
+        add_percentiles(metrics, 'latency_ms', 1e3 * np.array(self.latencies))
+        metrics['batch_size_mean'] = (float(batch_sizes.mean())
+                                      if len(batch_sizes) > 0 else None)
+
+        return metrics
+
+    async def wait_closed(self):
+        """Wait for the connections being served to finish."""
+
+        if self.connections:
+            await asyncio.wait(self.connections)
+
+    def shutdown(self):
+        """Stop the worker thread."""
+
+        self.executor.shutdown()
+
+
+def parse_hello(line):
+    """Check the first message of a connection.
+
+    Parameters
+    ----------
+    line: bytes
+        JSON object with the `action`, and optionally `target_seq_len`,
+        `forecast_every` and `encoding`; or with `metrics` set.
+
+    Returns
+    -------
+    hello: dict
+        The action, target_seq_len, forecast_every and encoding; or only
+        `metrics`.
+    """
+
+    try:
+        hello = json.loads(line)
+        if hello.get('metrics', False):
+            return {'metrics': True}
+        return {
+            'action': hello['action'],
+            'target_seq_len': int(hello.get('target_seq_len', 25)),
+            'forecast_every': int(hello.get('forecast_every', 1)),
+            'encoding': str(hello.get('encoding', 'json')),
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f'Malformed hello: {e}') from None
+
+
+def parse_frame(line):
+    """Get the pose of a frame message."""
+
+    try:
+        return np.array(json.loads(line)['frame'], dtype=np.float64)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'Malformed frame: {e}') from None
+
+
+async def serve_connection(hub, reader, writer):
+    """Run the stream of a connection until either side closes it.
+
+    Parameters
+    ----------
+    hub: StreamHub
+        Hub running the streams.
+    reader: asyncio.StreamReader
+        Reader of the connection.
+    writer: asyncio.StreamWriter
+        Writer of the connection.
+    """
+
+    session = None
+    sender = None
+    hub.connections.add(asyncio.current_task())
+    try:
+        hello = parse_hello(await reader.readline())
+        if 'metrics' in hello:
+            writer.write(encode_message(hub.metrics()))
+            await writer.drain()
+            return
+
+        session = await hub.open(**hello)
+        writer.write(encode_message({'stream': session.handle}))
+        await writer.drain()
+
+        async def send_forecasts():
+            try:
+                while True:
+                    writer.write(await hub.next_forecast(session))
+                    await writer.drain()
+                    session.forecasts.task_done()
+            except ConnectionError:
+                pass
+
+        sender = asyncio.create_task(send_forecasts())
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            await hub.push(session, parse_frame(line))
+
+        # The client is done sending, answer its last frames unless it left
+        flush = asyncio.create_task(hub.flush(session))
+        await asyncio.wait([flush, sender],
+                           return_when=asyncio.FIRST_COMPLETED)
+        flush.cancel()
+    except ValueError as e:
+        writer.write(encode_message({'error': str(e)}))
+    except ConnectionError:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        if session is not None:
+            await hub.close(session)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        hub.connections.discard(asyncio.current_task())
+
+
+async def start_server(hub, host='127.0.0.1', port=0):
+    """Start serving streams; `hub.run` must be running too.
+
+    Parameters
+    ----------
+    hub: StreamHub
+        Hub running the streams.
+    host: str
+        Address to listen on.
+    port: int
+        Port to listen on. 0 picks a free one.
+
+    Returns
+    -------
+    server: asyncio.Server
+        The listening server.
+    """
+
+    return await asyncio.start_server(functools.partial(serve_connection, hub),
+                                      host, port)
+
+
+async def run_server(args):
+    """Load a model and serve streams until cancelled.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    streaming = StreamingPredictor.load(args.checkpoint, args.stats or None)
+    hub = StreamHub(streaming, args.max_pending, args.max_wait_ms / 1e3,
+                    args.max_streams, args.max_target_seq_len)
+    inference = asyncio.create_task(hub.run())
+    server = await start_server(hub, args.host, args.port)
+
+    port = server.sockets[0].getsockname()[1]
+    logging.info(f'Serving streams of {args.checkpoint} on'
+                 f' {args.host}:{port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        inference.cancel()
+        hub.shutdown()
+
+
+def stream_server(args):
+    """Serve streams until interrupted.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Arguments from the parser.
+    """
+
+    # Set logger
+    logging.basicConfig(format='%(levelname)s: %(message)s',
+                        level=args.log_level)
+
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    # Load parser
+    args = stream_server_parser()
+
+    # Serving function
+    stream_server(args)
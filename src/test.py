@@ -13,20 +13,26 @@ IN_COLAB = 'google.colab' in sys.modules
 if not IN_COLAB:
     from parsers import testing_parser
     from utils.data_utils import read_all_data
+    from utils.data_utils import read_test_data
     from utils.data_utils import define_actions
-    from utils.data_utils import rotmat_to_expmap
-    from utils.data_utils import expmap_to_rotmat
-    from utils.data_utils import unnormalize_data
-    from utils.data_utils import revert_output_format
+    from utils.data_utils import STATS_FNAME
+    from utils.data_utils import rotmat_to_euler_batch
+    from utils.data_utils import expmap_to_rotmat_batch
+    from utils.data_utils import Denormalizer
     from utils.evaluation import evaluate_batch
+    from utils.sampling import WindowSampler
+    from models.predictor import Predictor
 else:
     from src.utils.data_utils import read_all_data
+    from src.utils.data_utils import read_test_data
     from src.utils.data_utils import define_actions
-    from src.utils.data_utils import rotmat_to_expmap
-    from src.utils.data_utils import expmap_to_rotmat
-    from src.utils.data_utils import unnormalize_data
-    from src.utils.data_utils import revert_output_format
+    from src.utils.data_utils import STATS_FNAME
+    from src.utils.data_utils import rotmat_to_euler_batch
+    from src.utils.data_utils import expmap_to_rotmat_batch
+    from src.utils.data_utils import Denormalizer
     from src.utils.evaluation import evaluate_batch
+    from src.utils.sampling import WindowSampler
+    from src.models.predictor import Predictor
 
 
 def get_srnn_gts(actions,
@@ -48,8 +54,8 @@ def get_srnn_gts(actions,
         Training model we are using (we only use the "get_batch" method).
     device : torch.device
         Device to use for training.
-    test_set: dict
-        Dictionary with normalized training data.
+    test_set: WindowSampler
+        Sampler over the normalized test data, built with the actions.
     data_mean: np.array
         d-long vector with the mean of the training data.
     data_std: np.array
@@ -68,25 +74,23 @@ def get_srnn_gts(actions,
     """
 
     srnn_gts_euler = {}
+    denormalize = Denormalizer(data_mean, data_std, dim_to_ignore)
 
     for action in actions:
-        srnn_gt_euler = []
         # get_batch or get_batch_srnn
         _, _, srnn_expmap = model.get_batch_srnn(test_set, action, device)
-        srnn_expmap = srnn_expmap.cpu()
+        srnn_expmap = srnn_expmap.cpu().numpy()
+        denormed = denormalize(srnn_expmap)
         # expmap -> rotmat -> euler
-        for i in np.arange(srnn_expmap.shape[0]):
-            denormed = unnormalize_data(srnn_expmap[i, :, :], data_mean,
-                                        data_std, dim_to_ignore, actions)
-            if to_euler:
-                for j in np.arange(denormed.shape[0]):
-                    for k in np.arange(3, 97, 3):
-                        denormed[j, k:k + 3] = rotmat_to_expmap(
-                            expmap_to_rotmat(denormed[j, k:k + 3]))
-            srnn_gt_euler.append(denormed)
+        if to_euler:
+            joints = denormed[..., 3:99].reshape(denormed.shape[:-1] +
+                                                 (32, 3))
+            denormed[..., 3:99] = rotmat_to_euler_batch(
+                expmap_to_rotmat_batch(joints)).reshape(
+                    denormed.shape[:-1] + (96, ))
 
         # Put back in the dictionary
-        srnn_gts_euler[action] = srnn_gt_euler
+        srnn_gts_euler[action] = denormed
     return srnn_gts_euler
 
 
@@ -128,31 +132,55 @@ def test(args):
     actions = define_actions(args.action)
     nsamples = 8
 
-    # Create the model
+    # Load the model and the stats saved during training
     logging.info(f'Creating a model with {args.size} units.')
     logging.info('Loading model')
-    model = torch.load(train_dir + '/model_' + str(args.load_model))
+    checkpoint_path = os.path.join(train_dir, f'model_{args.load_model}')
+    stats_path = os.path.join(train_dir, STATS_FNAME)
+    if os.path.exists(stats_path):
+        predictor = Predictor.load(checkpoint_path, stats_path, device)
+        if predictor.actions != actions:
+            raise ValueError(
+                f'Model was trained on actions {predictor.actions}'
+                f' but asked to test on {actions}')
+        data_mean, data_std = predictor.data_mean, predictor.data_std
+        dim_to_ignore = predictor.dim_to_ignore
+        test_set = read_test_data(actions, args.data_dir, data_mean, data_std,
+                                  predictor.dim_to_use, args.cache_dir,
+                                  args.load_workers)
+    else:
+        logging.warning(f'{stats_path} not found, recomputing the stats'
+                        ' from the training data')
+        _, test_set, data_mean, data_std, dim_to_ignore, dim_to_use = \
+            read_all_data(actions, 50, args.seq_length_out, args.data_dir,
+                          args.cache_dir, args.packed_dir, args.load_workers)
+        model = torch.load(checkpoint_path,
+                           map_location=device,
+                           weights_only=False)
+        predictor = Predictor(model, data_mean, data_std, dim_to_ignore,
+                              dim_to_use, actions, device)
+
+    model = predictor.model
     model.source_seq_len = 50
     model.target_seq_len = 100
-    model = model.to(device)
     logging.info('Model created')
 
-    # Load all the data
-    _, test_set, data_mean, data_std, dim_to_ignore, _ = read_all_data(
-        actions, 50, args.seq_length_out, args.data_dir)
+    # Index the test sequences once; the one-hot encoding of the actions
+    # is added to the poses when the seeds are gathered
+    test_sampler = WindowSampler(test_set, actions)
 
     # === Read and denormalize the gt with srnn's seeds, as we'll need them
     # many times for evaluation in Euler Angles ===
     srnn_gts_expmap = get_srnn_gts(actions,
                                    model,
                                    device,
-                                   test_set,
+                                   test_sampler,
                                    data_mean,
                                    data_std,
                                    dim_to_ignore,
                                    to_euler=False)
-    srnn_gts_euler = get_srnn_gts(actions, model, device, test_set, data_mean,
-                                  data_std, dim_to_ignore)
+    srnn_gts_euler = get_srnn_gts(actions, model, device, test_sampler,
+                                  data_mean, data_std, dim_to_ignore)
 
     # Clean and create a new h5 file of samples
     SAMPLES_FNAME = 'samples.h5'
@@ -166,21 +194,18 @@ def test(args):
 
         # Make prediction with srnn' seeds
         encoder_inputs, decoder_inputs, decoder_outputs = model.get_batch_srnn(
-            test_set, action, device)
-        # Forward pass
-        srnn_poses = model(encoder_inputs, decoder_inputs, device)
+            test_sampler, action, device)
+        # Forward pass, without gradients
+        srnn_poses = predictor.forward(encoder_inputs, decoder_inputs)
         srnn_loss = (srnn_poses - decoder_outputs)**2
         srnn_loss.cpu().data.numpy()
         srnn_loss = srnn_loss.mean()
         srnn_poses = srnn_poses.cpu().data.numpy()
-        srnn_poses = srnn_poses.transpose([1, 0, 2])
         srnn_loss = srnn_loss.cpu().data.numpy()
 
         # Restores the data in the same format as the original: dimension 99.
         # Returns a tensor of size (batch_size, seq_length, dim) output.
-        srnn_pred_expmap = revert_output_format(srnn_poses, data_mean,
-                                                data_std, dim_to_ignore,
-                                                actions)
+        srnn_pred_expmap = predictor.denormalize(srnn_poses)
 
         # Save the samples
         with h5py.File(SAMPLES_FNAME, 'a') as hf:
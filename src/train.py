@@ -8,19 +8,119 @@ import matplotlib.pyplot as plt
 import numpy as np
 import torch
 import torch.optim as optim
+from torch.utils.data import DataLoader
+from torch.utils.data import WeightedRandomSampler
 
 IN_COLAB = 'google.colab' in sys.modules
 if not IN_COLAB:
     from parsers import training_parser
     from utils.data_utils import read_all_data
     from utils.data_utils import define_actions
+    from utils.data_utils import save_normalization_stats
+    from utils.data_utils import STATS_FNAME
+    from utils.sampling import WindowSampler
+    from utils.prefetch import BatchPrefetcher
+    from utils.datasets import MotionWindowDataset
+    from utils.torch_evaluation import evaluate_batch
+    from utils.torch_evaluation import mpjpe
+    from utils.torch_kinematics import ForwardKinematics
     from models.motionpredictor import MotionPredictor
 else:
     from src.utils.data_utils import read_all_data
     from src.utils.data_utils import define_actions
+    from src.utils.data_utils import save_normalization_stats
+    from src.utils.data_utils import STATS_FNAME
+    from src.utils.sampling import WindowSampler
+    from src.utils.prefetch import BatchPrefetcher
+    from src.utils.datasets import MotionWindowDataset
+    from src.utils.torch_evaluation import evaluate_batch
+    from src.utils.torch_evaluation import mpjpe
+    from src.utils.torch_kinematics import ForwardKinematics
     from src.models.motionpredictor import MotionPredictor
 
 
+def loader_batches(train_set, actions, args, device):
+    """Endless stream of training batches from DataLoader workers.
+
+    Windows are weighted to be drawn like `MotionPredictor.get_batch`
+    does, and every pass over the sampler is a new random draw.
+
+    Parameters
+    ----------
+    train_set: dict or PackedSequences
+        Normalized training data.
+    actions : list
+        A list of the actions, in the order of the one-hot encoding.
+    args : argparse.Namespace
+        Arguments from the parser.
+    device : torch.device
+        Device to use for training.
+
+    Yields
+    ------
+    batch: tuple
+        encoder_inputs, decoder_inputs and decoder_outputs tensors.
+    """
+
+    dataset = MotionWindowDataset(train_set, args.seq_length_in,
+                                  args.seq_length_out, actions)
+    sampler = WeightedRandomSampler(dataset.window_weights(),
+                                    num_samples=len(dataset),
+                                    replacement=True)
+    loader = DataLoader(dataset,
+                        batch_size=args.batch_size,
+                        sampler=sampler,
+                        num_workers=args.dataloader_workers,
+                        persistent_workers=True,
+                        pin_memory=device.type == 'cuda',
+                        drop_last=True)
+
+    while True:
+        for batch in loader:
+            yield tuple(x.to(device, non_blocking=True) for x in batch)
+
+
+def srnn_errors(model, test_sampler, actions, data_mean, data_std,
+                dim_to_use, device):
+    """Euler angle error of the model on the SRNN seeds of every action,
+    computed on the device of the model.
+
+    Parameters
+    ----------
+    model: torch.nn.Module
+        Model to evaluate.
+    test_sampler: WindowSampler
+        Sampler over the normalized test data, built with the actions.
+    actions : list
+        A list of the actions to evaluate.
+    data_mean: torch.Tensor
+        99-long vector with the mean of the training data.
+    data_std: torch.Tensor
+        99-long vector with the standard deviation of the training data.
+    dim_to_use: torch.Tensor
+        Indices of the channels used by the model.
+    device : torch.device
+        Device to use for the evaluation.
+
+    Returns
+    -------
+    errors: dict
+        Mean error at every timestep, as a numpy vector, for each action.
+    """
+
+    errors = {}
+    with torch.no_grad():
+        for action in actions:
+            encoder_inputs, decoder_inputs, decoder_outputs = \
+                model.get_batch_srnn(test_sampler, action, device)
+            preds = model(encoder_inputs, decoder_inputs, device)
+            errors[action] = evaluate_batch(preds, decoder_outputs,
+                                            data_mean, data_std,
+                                            dim_to_use).cpu().numpy()
+
+    return errors
+
+
 def train(args):
     """Train a seq2seq model on human motion.
 
@@ -39,6 +139,10 @@ def train(args):
                             format='%(levelname)s: %(message)s',
                             level=args.log_level)
 
+    if args.dataloader_workers > 0 and args.prefetch_depth > 0:
+        raise ValueError('--dataloader_workers and --prefetch_depth are'
+                         ' mutually exclusive, set only one of them')
+
     # Set directory
     train_dir = os.path.normpath(
         os.path.join(args.train_dir, args.action, f'out_{args.seq_length_out}',
@@ -59,10 +163,26 @@ def train(args):
     actions = define_actions(args.action)
     number_of_actions = len(actions)
 
-    train_set, test_set, _, _, _, _ = read_all_data(actions,
-                                                    args.seq_length_in,
-                                                    args.seq_length_out,
-                                                    args.data_dir)
+    train_set, test_set, data_mean, data_std, dim_to_ignore, dim_to_use = \
+        read_all_data(actions, args.seq_length_in, args.seq_length_out,
+                      args.data_dir, args.cache_dir, args.packed_dir,
+                      args.load_workers)
+
+    # Keep the normalization stats next to the checkpoints, so evaluation
+    # does not need to load the training set again
+    save_normalization_stats(os.path.join(train_dir, STATS_FNAME), data_mean,
+                             data_std, dim_to_ignore, dim_to_use, actions)
+
+    # Index the sequences once, to draw the windows of every batch
+    train_sampler = WindowSampler(train_set, actions)
+    test_sampler = WindowSampler(test_set, actions)
+
+    # Stats to denormalize the predictions on the device, for the Euler
+    # angle error
+    data_mean_t = torch.from_numpy(data_mean).to(device)
+    data_std_t = torch.from_numpy(data_std).to(device)
+    dim_to_use_t = torch.as_tensor(dim_to_use, device=device)
+    fk = ForwardKinematics().to(device)
 
     # Create model for training only
     model = MotionPredictor(
@@ -72,7 +192,8 @@ def train(args):
         args.batch_size,
         args.learning_rate,
         args.learning_rate_decay_factor,
-        len(actions))
+        len(actions),
+        fused_encoder=args.fused_encoder)
     model = model.to(device)
 
     # This is the training loop
@@ -87,69 +208,122 @@ def train(args):
                            lr=args.learning_rate,
                            betas=(0.9, 0.999))
 
-    for _ in range(args.iterations):
-        optimiser.zero_grad()
-        # Set a flag to compute gradients
-        model.train()
-
-        # === Training step ===
-        # Get batch from the training set
-        encoder_inputs, decoder_inputs, decoder_outputs = model.get_batch(
-            train_set, actions, device)
-
-        # Forward pass
-        preds = model(encoder_inputs, decoder_inputs, device)
-
-        # Loss: Mean Squared Errors
-        step_loss = (preds - decoder_outputs)**2
-        step_loss = step_loss.mean()
-
-        # Backpropagation
-        step_loss.backward()
-
-        # Gradient descent step
-        optimiser.step()
-
-        step_loss = step_loss.cpu().data.numpy()
-
-        if current_step % 10 == 0:
-            logging.info(f'step {current_step:04}; step_loss: {step_loss:.4f}')
-        loss += step_loss / args.test_every
-        current_step += 1
-
-        # === step decay ===
-        if current_step % args.learning_rate_step == 0:
-            args.learning_rate = args.learning_rate * args.learning_rate_decay_factor
-            optimiser = optim.Adam(model.parameters(),
-                                   lr=args.learning_rate,
-                                   betas=(0.9, 0.999))
-            print('Decay learning rate. New value at {args.learning_rate}')
-
-        # Once in a while, save checkpoint, print statistics.
-        if current_step % args.test_every == 0:
-            model.eval()
-            # === Validation ===
-            encoder_inputs, decoder_inputs, decoder_outputs = model.get_batch(
-                test_set, actions, device)
+    # Prepare the training batches in the background, if requested
+    batches = None
+    prefetcher = None
+    if args.dataloader_workers > 0:
+        batches = loader_batches(train_set, actions, args, device)
+    elif args.prefetch_depth > 0:
+        prefetcher = BatchPrefetcher(
+            lambda rng: model.sample_windows(train_sampler, rng),
+            args.prefetch_depth, args.prefetch_workers)
+
+    # Stop the prefetching threads even if training fails
+    try:
+        for _ in range(args.iterations):
+            optimiser.zero_grad()
+            # Set a flag to compute gradients
+            model.train()
+
+            # === Training step ===
+            # Get batch from the training set
+            if batches is not None:
+                encoder_inputs, decoder_inputs, decoder_outputs = next(batches)
+            elif prefetcher is not None:
+                encoder_inputs, decoder_inputs, decoder_outputs = \
+                    model.split_windows(next(prefetcher), device)
+            else:
+                encoder_inputs, decoder_inputs, decoder_outputs = \
+                    model.get_batch(train_sampler, actions, device)
+
+            # Forward pass
             preds = model(encoder_inputs, decoder_inputs, device)
 
+            # Loss: Mean Squared Errors
             step_loss = (preds - decoder_outputs)**2
-            val_loss = step_loss.mean()
-
-            print('\n=================================\n'
-                  f'Global step:         {current_step}\n'
-                  f'Learning rate:       {args.learning_rate:.4}\n'
-                  f'Train loss avg:      {loss:.4}\n'
-                  '-------------------------------\n'
-                  f'Val loss:            {val_loss:.4}\n'
-                  '=================================\n')
-            all_val_losses.append(
-                [current_step, val_loss.cpu().detach().numpy()])
-            all_losses.append([current_step, loss])
-            torch.save(model, train_dir + '/model_' + str(current_step))
-
-            # Reset loss
-            loss = 0
+            step_loss = step_loss.mean()
+
+            # Optionally, add the error of the 3d joint positions
+            if args.xyz_loss_weight > 0:
+                step_loss = step_loss + args.xyz_loss_weight * mpjpe(
+                    preds, decoder_outputs, data_mean_t, data_std_t,
+                    dim_to_use_t, fk).mean()
+
+            # Backpropagation
+            step_loss.backward()
+
+            # Gradient descent step
+            optimiser.step()
+
+            step_loss = step_loss.cpu().data.numpy()
+
+            if current_step % 10 == 0:
+                logging.info(
+                    f'step {current_step:04}; step_loss: {step_loss:.4f}')
+            loss += step_loss / args.test_every
+            current_step += 1
+
+            # === step decay ===
+            if current_step % args.learning_rate_step == 0:
+                args.learning_rate = args.learning_rate * args.learning_rate_decay_factor
+                optimiser = optim.Adam(model.parameters(),
+                                       lr=args.learning_rate,
+                                       betas=(0.9, 0.999))
+                print('Decay learning rate. New value at {args.learning_rate}')
+
+            # Once in a while, save checkpoint, print statistics.
+            if current_step % args.test_every == 0:
+                model.eval()
+                # === Validation ===
+                encoder_inputs, decoder_inputs, decoder_outputs = \
+                    model.get_batch(test_sampler, actions, device)
+                preds = model(encoder_inputs, decoder_inputs, device)
+
+                step_loss = (preds - decoder_outputs)**2
+                val_loss = step_loss.mean()
+                with torch.no_grad():
+                    val_mpjpe = mpjpe(preds, decoder_outputs, data_mean_t,
+                                      data_std_t, dim_to_use_t, fk).mean()
+
+                print('\n=================================\n'
+                      f'Global step:         {current_step}\n'
+                      f'Learning rate:       {args.learning_rate:.4}\n'
+                      f'Train loss avg:      {loss:.4}\n'
+                      '-------------------------------\n'
+                      f'Val loss:            {val_loss:.4}\n'
+                      f'Val MPJPE (mm):      {val_mpjpe:.4}\n'
+                      '=================================\n')
+
+                # === SRNN Euler angle error, at 80, 160, 320, 400, 560 and
+                # 1000 ms ===
+                errors = srnn_errors(model, test_sampler, actions, data_mean_t,
+                                     data_std_t, dim_to_use_t, device)
+                horizons = [
+                    step for step in [1, 3, 7, 9, 13, 24]
+                    if step < args.seq_length_out
+                ]
+                mean_errors = np.mean(
+                    [errors[action] for action in actions], 0)
+                for action in actions:
+                    logging.info(f'{action:<16}' + ' '.join(
+                        f'{errors[action][step]:.3f}' for step in horizons))
+                print('Euler error (ms):   ' +
+                      ' '.join(f'{(step + 1) * 40:>6}' for step in horizons) +
+                      '\nMean over actions:  ' +
+                      ' '.join(f'{mean_errors[step]:6.3f}'
+                               for step in horizons) +
+                      '\n')
+
+                all_val_losses.append(
+                    [current_step, val_loss.cpu().detach().numpy()])
+                all_losses.append([current_step, loss])
+                torch.save(model, train_dir + '/model_' + str(current_step))
+
+                # Reset loss
+                loss = 0
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
 
     vlosses = np.array(all_val_losses)
     tlosses = np.array(all_losses)
@@ -0,0 +1,209 @@
+"""Dynamic batching of concurrent requests."""
+
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def add_percentiles(metrics, name, values, percentiles=(50, 90, 99)):
+    """Add the percentiles of values to a dictionary of metrics.
+
+    Parameters
+    ----------
+    metrics: dict
+        Metrics to add the `<name>_p<percentile>` entries to.
+    name: str
+        Name of the values.
+    values: np.array
+        The values; the percentiles are None if empty.
+    percentiles: tuple
+        Percentiles to add.
+    """
+
+    for p in percentiles:
+        metrics[f'{name}_p{p}'] = (float(np.percentile(values, p))
+                                   if len(values) > 0 else None)
+
+
+class DynamicBatcher(object):
+    """Coalesces requests submitted from many threads into batches.
+
+    A worker thread waits for a first request, then keeps collecting
+    requests until the batch is full or `max_wait` seconds went by, and
+    runs them all with one call to `run_batch`. Every request gets its own
+    result through a future. The times of the last requests are kept to
+    report queue wait, batch size and latency percentiles.
+    """
+
+    def __init__(self,
+                 run_batch,
+                 max_batch_size=32,
+                 max_wait=0.005,
+                 history=10000):
+        """Constructor of the class. Starts the worker.
+
+        Parameters
+        ----------
+        run_batch: callable
+            Function that takes a list of requests and returns the list of
+            their results, in the same order.
+        max_batch_size: int
+            Maximum number of requests in a batch.
+        max_wait: float
+            Maximum time, in seconds, to wait for more requests after the
+            first one of a batch.
+        history: int
+            Number of requests and batches kept for the metrics.
+        """
+
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.queue_waits = collections.deque(maxlen=history)
+        self.latencies = collections.deque(maxlen=history)
+        self.batch_sizes = collections.deque(maxlen=history)
+        self.n_requests = 0
+        self.n_batches = 0
+        self.n_errors = 0
+
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def submit(self, request):
+        """Queue a request.
+
+        Parameters
+        ----------
+        request:
+            Anything `run_batch` takes in its list.
+
+        Returns
+        -------
+        future: concurrent.futures.Future
+            Future of the result of the request.
+        """
+
+        future = Future()
+        # Under the lock, so that `close` cannot run between the check and
+        # the put, which would leave the request queued forever
+        with self.lock:
+            if self.stop_event.is_set():
+                raise RuntimeError('The batcher is closed')
+            self.queue.put((request, future, time.perf_counter()))
+
+        return future
+
+    def _collect(self):
+        """Wait for a batch of requests, or return None if closed."""
+
+        while not self.stop_event.is_set():
+            try:
+                batch = [self.queue.get(timeout=0.1)]
+                break
+            except queue.Empty:
+                continue
+        else:
+            return None
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    batch.append(self.queue.get(timeout=timeout))
+                else:
+                    # Deadline passed, only take what is already there
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _work(self):
+        """Loop of the worker thread."""
+
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            start = time.perf_counter()
+            requests = [request for request, _, _ in batch]
+            try:
+                results = self.run_batch(requests)
+                error = None
+            except Exception as e:  # pylint: disable=broad-except
+                error = e
+            end = time.perf_counter()
+
+            with self.lock:
+                self.n_requests += len(batch)
+                self.n_batches += 1
+                self.n_errors += len(batch) if error is not None else 0
+                self.batch_sizes.append(len(batch))
+                for _, _, submitted in batch:
+                    self.queue_waits.append(start - submitted)
+                    self.latencies.append(end - submitted)
+
+            for i, (_, future, _) in enumerate(batch):
+                if error is None:
+                    future.set_result(results[i])
+                else:
+                    future.set_exception(error)
+
+    def metrics(self):
+        """Counters, and percentiles over the last requests and batches.
+
+        Returns
+        -------
+        metrics: dict
+            Number of requests, batches and errors, mean batch size, and
+            the 50th, 90th and 99th percentiles of the batch size and of
+            the queue wait and latency in milliseconds.
+        """
+
+        with self.lock:
+            queue_waits = 1e3 * np.array(self.queue_waits)
+            latencies = 1e3 * np.array(self.latencies)
+            batch_sizes = np.array(self.batch_sizes)
+            metrics = {
+                'requests': self.n_requests,
+                'batches': self.n_batches,
+                'errors': self.n_errors,
+                'queued': self.queue.qsize(),
+            }
+
+        add_percentiles(metrics, 'batch_size', batch_sizes)
+        add_percentiles(metrics, 'queue_wait_ms', queue_waits)
+        add_percentiles(metrics, 'latency_ms', latencies)
+        metrics['batch_size_mean'] = (float(batch_sizes.mean())
+                                      if len(batch_sizes) > 0 else None)
+
+        return metrics
+
+    def close(self):
+        """Stop the worker, failing the requests still queued."""
+
+        with self.lock:
+            self.stop_event.set()
+        self.worker.join()
+        while True:
+            try:
+                _, future, _ = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError('The batcher is closed'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
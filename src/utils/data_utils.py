@@ -1,11 +1,30 @@
 """Functions that help with data processing for human3.6m"""
 
-from six.moves import xrange  # pylint: disable=redefined-builtin
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import logging
-import copy
+import shutil
+import sys
+import os
 
 import numpy as np
 
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.packed_data import PackedSequences
+else:
+    from src.utils.packed_data import PackedSequences
+
+# Subjects used for training and testing, following SRNN
+TRAIN_SUBJECT_IDS = [1, 6, 7, 9, 11]
+TEST_SUBJECT_IDS = [5]
+
+# Name of the normalization stats artifact written next to checkpoints
+STATS_FNAME = 'stats.npz'
+
+# Version of the layout of the packed datasets, part of their path
+PACKED_FORMAT_VERSION = 2
+
 
 def rotmat_to_euler(R):
     """Converts a rotation matrix to Euler angles.
@@ -68,7 +87,7 @@ def quat_to_expmap(q):
     """
 
     if (np.abs(np.linalg.norm(q) - 1) > 1e-3):
-        raise (ValueError, 'quat_to_expmap: input quaternion is not norm 1')
+        raise ValueError('quat_to_expmap: input quaternion is not norm 1')
 
     sinhalftheta = np.linalg.norm(q[1:])
     coshalftheta = q[0]
@@ -169,9 +188,227 @@ def expmap_to_rotmat(r):
     return R
 
 
+def rotmat_to_euler_batch(R):
+    """Converts rotation matrices to Euler angles.
+
+    Batched version of `rotmat_to_euler`; the gimbal lock case is
+    handled with a mask instead of a branch.
+
+    Parameters
+    ----------
+    R: np.array
+        (..., 3, 3) rotation matrices.
+
+    Returns
+    -------
+    eul: np.array
+        (..., 3) Euler angle representations of R.
+    """
+
+    R02 = R[..., 0, 2]
+    special = (R02 == 1) | (R02 == -1)
+
+    # General case; finite, and then discarded, for the special case
+    E2 = -np.arcsin(R02)
+    cos_E2 = np.cos(E2)
+    E1 = np.arctan2(R[..., 1, 2] / cos_E2, R[..., 2, 2] / cos_E2)
+    E3 = np.arctan2(R[..., 0, 1] / cos_E2, R[..., 0, 0] / cos_E2)
+
+    # Special case, with E3 set arbitrarily to 0
+    dlta = np.arctan2(R[..., 0, 1], R02)
+    E1 = np.where(special, dlta, E1)
+    E2 = np.where(special, np.where(R02 == -1, np.pi / 2, -np.pi / 2), E2)
+    E3 = np.where(special, 0, E3)
+
+    return np.stack([E1, E2, E3], axis=-1)
+
+
+def quat_to_expmap_batch(q):
+    """Converts quaternions to exponential maps.
+
+    Batched version of `quat_to_expmap`.
+
+    Parameters
+    ----------
+    q: np.array
+        (..., 4) quaternions.
+
+    Returns
+    -------
+    r: np.array
+        (..., 3) exponential maps.
+
+    Raises
+    ------
+    ValueError
+        If the l2 norm of any quaternion is not close to 1.
+    """
+
+    if np.any(np.abs(np.linalg.norm(q, axis=-1) - 1) > 1e-3):
+        raise ValueError('quat_to_expmap: input quaternion is not norm 1')
+
+    sinhalftheta = np.linalg.norm(q[..., 1:], axis=-1)
+    coshalftheta = q[..., 0]
+
+    r0 = q[..., 1:] / (sinhalftheta + np.finfo(np.float32).eps)[..., None]
+    theta = 2 * np.arctan2(sinhalftheta, coshalftheta)
+    theta = np.mod(theta + 2 * np.pi, 2 * np.pi)
+
+    flip = theta > np.pi
+    theta = np.where(flip, 2 * np.pi - theta, theta)
+    r0 = np.where(flip[..., None], -r0, r0)
+
+    return r0 * theta[..., None]
+
+
+def rotmat_to_quat_batch(R):
+    """Converts rotation matrices to quaternions.
+
+    Batched version of `rotmat_to_quat`.
+
+    Parameters
+    ----------
+    R: np.array
+        (..., 3, 3) rotation matrices.
+
+    Returns
+    -------
+    q: np.array
+        (..., 4) quaternions.
+    """
+
+    rotdiff = R - np.swapaxes(R, -1, -2)
+
+    r = np.stack(
+        [-rotdiff[..., 1, 2], rotdiff[..., 0, 2], -rotdiff[..., 0, 1]],
+        axis=-1)
+    r_norm = np.linalg.norm(r, axis=-1)
+
+    sintheta = r_norm / 2
+    r0 = r / (r_norm + np.finfo(np.float32).eps)[..., None]
+
+    costheta = (np.trace(R, axis1=-2, axis2=-1) - 1) / 2
+    theta = np.arctan2(sintheta, costheta)
+
+    q = np.empty(R.shape[:-2] + (4, ))
+    q[..., 0] = np.cos(theta / 2)
+    q[..., 1:] = r0 * np.sin(theta / 2)[..., None]
+
+    return q
+
+
+def rotmat_to_expmap_batch(R):
+    """Converts rotation matrices to exponential maps.
+
+    Batched version of `rotmat_to_expmap`.
+
+    Parameters
+    ----------
+    R: np.array
+        (..., 3, 3) rotation matrices.
+
+    Returns
+    -------
+    r: np.array
+        (..., 3) exponential maps.
+    """
+
+    return quat_to_expmap_batch(rotmat_to_quat_batch(R))
+
+
+def expmap_to_rotmat_batch(r):
+    """Converts exponential maps to rotation matrices.
+
+    Batched version of `expmap_to_rotmat` (Rodrigues' formula).
+
+    Parameters
+    ----------
+    r: np.array
+        (..., 3) exponential maps.
+
+    Returns
+    -------
+    R: np.array
+        (..., 3, 3) rotation matrices.
+    """
+
+    theta = np.linalg.norm(r, axis=-1)
+    r0 = r / (theta + np.finfo(np.float32).eps)[..., None]
+
+    # Cross-product (skew-symmetric) matrices of the unit axes
+    r0x = np.zeros(r.shape[:-1] + (3, 3))
+    r0x[..., 0, 1] = -r0[..., 2]
+    r0x[..., 0, 2] = r0[..., 1]
+    r0x[..., 1, 2] = -r0[..., 0]
+    r0x = r0x - np.swapaxes(r0x, -1, -2)
+
+    sin_theta = np.sin(theta)[..., None, None]
+    cos_theta = np.cos(theta)[..., None, None]
+    R = np.eye(3, 3) + sin_theta * r0x \
+        + (1 - cos_theta) * np.matmul(r0x, r0x)
+
+    return R
+
+
+class Denormalizer(object):
+    """Maps outputs of the model back to the original 99 channels.
+
+    Built once from the normalization stats; every call denormalizes a
+    whole block of poses with one broadcasted multiply-add.
+    """
+
+    def __init__(self, data_mean, data_std, dim_to_ignore):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        data_mean: np.array
+            Vector of mean used to normalize the data.
+        data_std: np.array
+            Vector of standard deviation used to normalize the data.
+        dim_to_ignore: np.array
+            Vector with dimensions not used by the model.
+        """
+
+        self.data_mean = data_mean
+        self.data_std = data_std
+        self.dim = data_mean.shape[0]
+        self.dim_to_use = np.setdiff1d(np.arange(self.dim), dim_to_ignore)
+        self.dim_to_ignore = np.setdiff1d(np.arange(self.dim),
+                                          self.dim_to_use)
+        self.dtype = np.result_type(np.float32, data_mean, data_std)
+
+    def __call__(self, poses, out=None):
+        """Denormalize poses.
+
+        Parameters
+        ----------
+        poses: np.array
+            (..., d) normalized poses, e.g. a (batch_size, seq_len, d)
+            output of the model; trailing one-hot channels are ignored.
+        out: np.array
+            (..., 99) array to write the result to. Allocated if None.
+
+        Returns
+        -------
+        out: np.array
+            (..., 99) denormalized poses; the unused channels hold the mean.
+        """
+
+        if out is None:
+            out = np.empty(poses.shape[:-1] + (self.dim, ), dtype=self.dtype)
+
+        out[..., self.dim_to_use] = poses[..., :len(self.dim_to_use)]
+        out[..., self.dim_to_ignore] = 0
+        np.multiply(out, self.data_std, out=out)
+        np.add(out, self.data_mean, out=out)
+
+        return out
+
+
 def unnormalize_data(normalized_data, data_mean, data_std,
                      dimensions_to_ignore, actions):
-    """Reads a csv file and returns a float32 matrix.
+    """Denormalizes a sequence of outputs of the model.
 
     Borrowed from SRNN code.
     https://github.com/asheshjain399/RNNexp/blob/srnn/structural_rnn/CRFProblems/H3.6m/generateMotionData.py#L12
@@ -195,27 +432,9 @@ def unnormalize_data(normalized_data, data_mean, data_std,
         Data originally used.
     """
 
-    T = normalized_data.shape[0]
-    D = data_mean.shape[0]
-
-    orig_data = np.zeros((T, D), dtype=np.float32)
-    dimensions_to_use = []
-    for i in range(D):
-        if i in dimensions_to_ignore:
-            continue
-        dimensions_to_use.append(i)
-    dimensions_to_use = np.array(dimensions_to_use)
-
-    orig_data[:, dimensions_to_use] = normalized_data[:, :-len(actions)]
-
-    # potentially ineficient, but only done once per experiment
-    std_mat = data_std.reshape((1, D))
-    std_mat = np.repeat(std_mat, T, axis=0)
-    mean_mat = data_mean.reshape((1, D))
-    mean_mat = np.repeat(mean_mat, T, axis=0)
-    orig_data = np.multiply(orig_data, std_mat) + mean_mat
+    denormalize = Denormalizer(data_mean, data_std, dimensions_to_ignore)
 
-    return orig_data
+    return denormalize(normalized_data[:, :-len(actions)])
 
 
 def revert_output_format(poses, data_mean, data_std, dim_to_ignore, actions):
@@ -236,21 +455,12 @@ def revert_output_format(poses, data_mean, data_std, dim_to_ignore, actions):
         batch is an n-by-d sequence of poses.
     """
 
-    seq_len = len(poses)
-    if seq_len == 0:
+    if len(poses) == 0:
         return []
 
-    batch_size, dim = poses[0].shape
+    denormalize = Denormalizer(data_mean, data_std, dim_to_ignore)
 
-    poses_out = np.concatenate(poses)
-    poses_out = np.reshape(poses_out, (seq_len, batch_size, dim))
-    poses_out = np.transpose(poses_out, [1, 0, 2])
-    poses_out_list = []
-    for i in xrange(poses_out.shape[0]):
-        poses_out_list.append(
-            unnormalize_data(poses_out[i, :, :], data_mean, data_std,
-                             dim_to_ignore, actions))
-    return poses_out_list
+    return denormalize(np.stack(poses, axis=1)[..., :-len(actions)])
 
 
 def read_csv_as_float(filename):
@@ -281,7 +491,146 @@ def read_csv_as_float(filename):
     return np.array(return_array)
 
 
-def load_data(path_to_dataset, subjects, actions):
+def sequence_cache_path(filename, cache_dir):
+    """Path of the binary cache entry for a text sequence.
+
+    The entry is keyed by the absolute path of the source file and its
+    modification time and size, so editing or replacing a file
+    invalidates its cached copy.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the csv file.
+    cache_dir: str
+        Directory where the cached sequences are stored.
+
+    Returns
+    -------
+    cache_path: str
+        Path to the .npy file caching the parsed sequence.
+    """
+
+    stat = os.stat(filename)
+    key = '{0}:{1}:{2}'.format(os.path.abspath(filename), stat.st_mtime_ns,
+                               stat.st_size)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(filename))[0]
+    subject = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+
+    return os.path.join(cache_dir, f'{subject}_{name}_{digest}.npy')
+
+
+def read_sequence(filename, cache_dir=None):
+    """Reads a sequence, going through the binary cache when possible.
+
+    The first read parses the text file and stores the result as a
+    float32 .npy file in `cache_dir`; later reads load that file instead.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the csv file.
+    cache_dir: str
+        Directory with the cached sequences. If None or empty, the text
+        file is always parsed.
+
+    Returns
+    -------
+    sequence: np.array
+        The read data in a float32 matrix.
+    """
+
+    if not cache_dir:
+        return read_csv_as_float(filename)
+
+    cache_path = sequence_cache_path(filename, cache_dir)
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    sequence = read_csv_as_float(filename).astype(np.float32, copy=False)
+
+    # Write to a temporary file first, so that concurrent readers never
+    # see a partially written entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, sequence)
+    os.replace(tmp_path, cache_path)
+
+    return sequence
+
+
+def sequence_filename(path_to_dataset, subj, action, subact):
+    """Path of the csv file of a sequence.
+
+    Parameters
+    ----------
+    path_to_dataset: str
+        Directory where the data resides.
+    subj: int
+        The subject.
+    action: str
+        The action.
+    subact: int
+        The subaction.
+
+    Returns
+    -------
+    filename: str
+        Path to the csv file.
+    """
+
+    return '{0}/S{1}/{2}_{3}.txt'.format(path_to_dataset, subj, action,
+                                         subact)
+
+
+def load_sequence(path_to_dataset, subj, action, subact, cache_dir=None):
+    """Reads one sequence and keeps its even frames.
+
+    Parameters
+    ----------
+    path_to_dataset: str
+        Directory where the data resides.
+    subj: int
+        The subject to load.
+    action: str
+        The action to load.
+    subact: int
+        The subaction to load.
+    cache_dir: str
+        Directory with the binary cache of the parsed sequences.
+
+    Returns
+    -------
+    the_sequence: np.array
+        (n/2)xd float32 matrix with the even frames.
+    stats: RunningStats
+        Mean and variance of all the frames. Used to normlization stats.
+    """
+
+    logging.info(
+        f'Reading subject {subj}, action {action}, subaction {subact}')
+    filename = sequence_filename(path_to_dataset, subj, action, subact)
+    action_sequence = read_sequence(filename, cache_dir)
+    # The action is not stored per frame; it is given by the key of the
+    # sequence, and encoded only when batches are assembled
+    the_sequence = np.ascontiguousarray(action_sequence[::2, :])
+
+    return the_sequence, RunningStats().update(action_sequence)
+
+
+def _load_sequence_job(job):
+    """Unpacks the arguments of `load_sequence` for a worker process."""
+
+    return load_sequence(*job)
+
+
+def load_data(path_to_dataset,
+              subjects,
+              actions,
+              cache_dir=None,
+              num_workers=0):
     """This is how the SRNN code reads the provided .txt files.
 
     Borrowed from SRNN code.
@@ -295,84 +644,168 @@ def load_data(path_to_dataset, subjects, actions):
         The subjects to load.
     actions: list
         A list of strings with the actions to load.
+    cache_dir: str
+        Directory with the binary cache of the parsed sequences. If None
+        or empty, the text files are parsed every time.
+    num_workers: int
+        Number of worker processes reading files concurrently. 0 reads
+        them serially in this process. The result does not depend on it.
     
     Returns
     -------
     train_data: 
         A dictionary with k:v; k=(subject, action, subaction, 'even'),
-        v=(nxd) un-normalized data.
-    complete_data: np.array
-        nxd matrix with all the data. Used to normlization stats.
+        v=(nxd) un-normalized poses, without the action encoding.
+    complete_stats: RunningStats
+        Mean and variance of all the data. Used to normlization stats.
     """
 
-    n_actions = len(actions)
+    jobs = []
+    for subj in subjects:
+        for action in actions:
+            for subact in [1, 2]:  # subactions
+                jobs.append((path_to_dataset, subj, action, subact, cache_dir))
+
+    if num_workers > 0:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            # map yields in submission order, so the merge is deterministic
+            results = list(executor.map(_load_sequence_job, jobs))
+    else:
+        results = map(_load_sequence_job, jobs)
 
     train_data = {}
-    complete_data = []
-    for subj in subjects:
-        for action_idx in np.arange(len(actions)):
-            action = actions[action_idx]
+    complete_stats = RunningStats()
+    for job, (the_sequence, stats) in zip(jobs, results):
+        _, subj, action, subact, _ = job
+        train_data[(subj, action, subact, 'even')] = the_sequence
+        complete_stats.merge(stats)
+    return train_data, complete_stats
 
-            for subact in [1, 2]:  # subactions
-                logging.info(
-                    f'Reading subject {subj}, action {action}, subaction {subact}'
-                )
-                filename = '{0}/S{1}/{2}_{3}.txt'.format(
-                    path_to_dataset, subj, action, subact)
-                action_sequence = read_csv_as_float(filename)
-                n, d = action_sequence.shape
-                even_list = range(0, n, 2)
-                # Add a one-hot encoding at the end of the representation
-                the_sequence = np.zeros((len(even_list), d + n_actions),
-                                        dtype=float)
-                the_sequence[:, 0:d] = action_sequence[even_list, :]
-                the_sequence[:, d + action_idx] = 1
-                train_data[(subj, action, subact, 'even')] = the_sequence
-
-                if len(complete_data) == 0:
-                    complete_data = copy.deepcopy(action_sequence)
-                else:
-                    complete_data = np.append(complete_data,
-                                              action_sequence,
-                                              axis=0)
-    return train_data, complete_data
-
-
-def normalize_data(data, data_mean, data_std, dim_to_use, actions):
+
+def normalize_data(data, data_mean, data_std, dim_to_use):
     """Normalize input data by removing unused dimensions, subtracting
     the mean and dividing by the standard deviation.
 
+    The normalized sequences are written straight into one packed float32
+    array, without intermediate copies. They hold the poses only; the
+    one-hot encoding of the action is added when batches are assembled.
+
     Parameters
     ----------
-    data: np.array
-        nx99 matrix with data to normalize.
+    data: dict
+        Dictionary with k:v, k=(subject, action, subaction, 'even'),
+        v=nxd matrix with un-normalized data.
     data_mean: np.array
         Vector of mean used to normalize the data.
     data_std: np.array
         Vector of standard deviation used to normalize the data.
     dim_to_use: np.array
         Vector with dimensions used by the model.
-    actions: list
-        A list of strings with the encoded actions.
     
     Returns
     -------
-    data_out: np.array
-        The passed data matrix, but normalized.
+    data_out: PackedSequences
+        The passed sequences, but normalized.
     """
 
-    data_out = {}
-    n_actions = len(actions)
+    n_dims = len(dim_to_use)
+    # Normalize in double precision, then round once when storing
+    mean_to_use = data_mean[dim_to_use].astype(np.float64)
+    std_to_use = data_std[dim_to_use].astype(np.float64)
+
+    lengths = {key: value.shape[0] for key, value in data.items()}
+    data_out = PackedSequences.empty(lengths, n_dims)
 
     # TODO hard-coding 99 dimensions for un-normalized human poses
     for key in data.keys():
-        data_out[key] = np.divide((data[key][:, 0:99] - data_mean), data_std)
-        data_out[key] = data_out[key][:, dim_to_use]
-        data_out[key] = np.hstack((data_out[key], data[key][:, -n_actions:]))
+        data_out[key][:] = np.divide(data[key][:, dim_to_use] - mean_to_use,
+                                     std_to_use)
 
     return data_out
 
 
+class RunningStats(object):
+    """Streaming, mergeable mean and variance of the rows of matrices.
+
+    Statistics of separate chunks are combined with the pairwise update
+    of Chan et al., so chunks can be accumulated in any grouping (e.g.
+    one per file, or one per worker process) without keeping the data.
+    """
+
+    def __init__(self):
+        """Constructor of the class."""
+
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, data):
+        """Accumulate the rows of a matrix.
+
+        Parameters
+        ----------
+        data: np.array
+            nxd matrix.
+
+        Returns
+        -------
+        self: RunningStats
+            The updated statistics.
+        """
+
+        other = RunningStats()
+        other.count = data.shape[0]
+        if other.count == 0:
+            return self
+        other.mean = np.mean(data, axis=0, dtype=np.float64)
+        other.m2 = np.sum(np.square(data - other.mean), axis=0)
+
+        return self.merge(other)
+
+    def merge(self, other):
+        """Accumulate the statistics of another `RunningStats`.
+
+        Parameters
+        ----------
+        other: RunningStats
+            Statistics of a different chunk of rows.
+
+        Returns
+        -------
+        self: RunningStats
+            The updated statistics.
+        """
+
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.m2 = other.m2.copy()
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + np.square(delta) * (self.count *
+                                                           other.count / count)
+        self.count = count
+
+        return self
+
+    @property
+    def variance(self):
+        """Population variance of the accumulated rows."""
+
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation of the accumulated rows."""
+
+        return np.sqrt(self.variance)
+
+
 def normalization_stats(complete_data):
     """Computes mean, stdev and dimensions to ignore.
 
@@ -381,8 +814,8 @@ def normalization_stats(complete_data):
 
     Parameters
     ----------
-    complete_data: np.array
-        nx99 matrix with data to normalize.
+    complete_data: RunningStats or np.array
+        Statistics of the data to normalize, or the nx99 matrix itself.
     
     Returns
     -------
@@ -396,8 +829,12 @@ def normalization_stats(complete_data):
         A vector with dimensions used by the model.
     """
 
-    data_mean = np.mean(complete_data, axis=0)
-    data_std = np.std(complete_data, axis=0)
+    if not isinstance(complete_data, RunningStats):
+        complete_data = RunningStats().update(complete_data)
+
+    # The data is stored in float32, and so are the stats
+    data_mean = complete_data.mean.astype(np.float32)
+    data_std = complete_data.std.astype(np.float32)
 
     dimensions_to_ignore = []
     dimensions_to_use = []
@@ -408,6 +845,161 @@ def normalization_stats(complete_data):
     return data_mean, data_std, dimensions_to_ignore, dimensions_to_use
 
 
+def save_normalization_stats(path, data_mean, data_std, dim_to_ignore,
+                             dim_to_use, actions):
+    """Write the normalization stats to a .npz file.
+
+    Parameters
+    ----------
+    path: str
+        Path of the .npz file.
+    data_mean: np.array
+        d-long vector with the mean of the training data.
+    data_std: np.array
+        d-long vector with the standard dev of the training data.
+    dim_to_ignore: np.array
+        The dimensions that are not used becaused stdev is too small.
+    dim_to_use: np.array
+        The dimensions that we are actually using in the model.
+    actions: list
+        A list of strings with the encoded actions.
+    """
+
+    np.savez(path,
+             data_mean=data_mean,
+             data_std=data_std,
+             dim_to_ignore=np.asarray(dim_to_ignore, dtype=int),
+             dim_to_use=np.asarray(dim_to_use, dtype=int),
+             actions=np.asarray(actions))
+
+
+def load_normalization_stats(path):
+    """Read the normalization stats written by `save_normalization_stats`.
+
+    Parameters
+    ----------
+    path: str
+        Path of the .npz file.
+
+    Returns
+    -------
+    data_mean: np.array
+        d-long vector with the mean of the training data.
+    data_std: np.array
+        d-long vector with the standard dev of the training data.
+    dim_to_ignore: np.array
+        The dimensions that are not used becaused stdev is too small.
+    dim_to_use: np.array
+        The dimensions that we are actually using in the model.
+    actions: list
+        A list of strings with the encoded actions.
+    """
+
+    with np.load(path) as stats:
+        return (stats['data_mean'], stats['data_std'], stats['dim_to_ignore'],
+                stats['dim_to_use'], [str(a) for a in stats['actions']])
+
+
+def packed_data_path(packed_dir, actions, data_dir):
+    """Directory of the packed dataset for a set of actions.
+
+    The path depends on the modification time and size of every source
+    file, as the cache paths of `sequence_cache_path` do, so that editing
+    the data packs it again.
+
+    Parameters
+    ----------
+    packed_dir: str
+        Root directory of the packed datasets.
+    actions: list
+        A list of strings with the actions in the dataset.
+    data_dir: str
+        The directory the data was loaded from.
+
+    Returns
+    -------
+    path: str
+        Directory holding the packed train and test sets.
+    """
+
+    files = []
+    for subj in TRAIN_SUBJECT_IDS + TEST_SUBJECT_IDS:
+        for action in actions:
+            for subact in [1, 2]:
+                stat = os.stat(sequence_filename(data_dir, subj, action,
+                                                 subact))
+                files.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+
+    key = '{0}:{1}:{2}:{3}'.format(PACKED_FORMAT_VERSION,
+                                   os.path.abspath(data_dir),
+                                   ','.join(actions), ','.join(files))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(packed_dir, digest)
+
+
+def save_packed_data(path, train_set, test_set, data_mean, data_std,
+                     dim_to_ignore, dim_to_use, actions):
+    """Write normalized train/test sets and their stats as packed data.
+
+    The files are written to a temporary directory that is then renamed,
+    so that concurrent processes never see a partial dataset.
+
+    Parameters
+    ----------
+    path: str
+        Directory of the packed dataset.
+    train_set: PackedSequences
+        Normalized training data.
+    test_set: PackedSequences
+        Normalized test data.
+    data_mean: np.array
+        d-long vector with the mean of the training data.
+    data_std: np.array
+        d-long vector with the standard dev of the training data.
+    dim_to_ignore: np.array
+        The dimensions that are not used becaused stdev is too small.
+    dim_to_use: np.array
+        The dimensions that we are actually using in the model.
+    actions: list
+        A list of strings with the encoded actions.
+    """
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    train_set.save(os.path.join(tmp_path, 'train'))
+    test_set.save(os.path.join(tmp_path, 'test'))
+    save_normalization_stats(os.path.join(tmp_path, 'stats.npz'), data_mean,
+                             data_std, dim_to_ignore, dim_to_use, actions)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process packed the same dataset first
+        shutil.rmtree(tmp_path)
+
+
+def load_packed_data(path, mmap=True):
+    """Read normalized train/test sets written by `save_packed_data`.
+
+    Parameters
+    ----------
+    path: str
+        Directory of the packed dataset.
+    mmap: bool
+        Whether to memory-map the frames instead of reading them.
+
+    Returns
+    -------
+    Same as `read_all_data`.
+    """
+
+    train_set = PackedSequences.load(os.path.join(path, 'train'), mmap)
+    test_set = PackedSequences.load(os.path.join(path, 'test'), mmap)
+    data_mean, data_std, dim_to_ignore, dim_to_use, _ = \
+        load_normalization_stats(os.path.join(path, 'stats.npz'))
+
+    return train_set, test_set, data_mean, data_std, dim_to_ignore, dim_to_use
+
+
 def define_actions(action):
     """
     Define the list of actions we are using.
@@ -435,7 +1027,52 @@ def define_actions(action):
     raise (ValueError, f'Unrecognized action: {action}')
 
 
-def read_all_data(actions, seq_length_in, seq_length_out, data_dir):
+def read_test_data(actions,
+                   data_dir,
+                   data_mean,
+                   data_std,
+                   dim_to_use,
+                   cache_dir=None,
+                   num_workers=0):
+    """Loads only the test data and normalizes it with precomputed stats.
+
+    Parameters
+    ----------
+    actions: list
+        A list of strings (actions) to load.
+    data_dir: str
+        The directory to load the data from.
+    data_mean: np.array
+        d-long vector with the mean of the training data.
+    data_std: np.array
+        d-long vector with the standard dev of the training data.
+    dim_to_use: np.array
+        The dimensions that we are actually using in the model.
+    cache_dir: str
+        Directory with the binary cache of the parsed sequences.
+    num_workers: int
+        Number of worker processes reading files concurrently.
+
+    Returns
+    -------
+    test_set: PackedSequences
+        A mapping with normalized test data.
+    """
+
+    logging.info('Reading test data.')
+    test_set, _ = load_data(data_dir, TEST_SUBJECT_IDS, actions, cache_dir,
+                            num_workers)
+
+    return normalize_data(test_set, data_mean, data_std, dim_to_use)
+
+
+def read_all_data(actions,
+                  seq_length_in,
+                  seq_length_out,
+                  data_dir,
+                  cache_dir=None,
+                  packed_dir=None,
+                  num_workers=0):
     """Loads data for training/testing and normalizes it.
 
     Parameters
@@ -448,13 +1085,21 @@ def read_all_data(actions, seq_length_in, seq_length_out, data_dir):
         The number of frames to use in the output sequence.
     data_dir: str
         The directory to load the data from.
+    cache_dir: str
+        Directory with the binary cache of the parsed sequences.
+    packed_dir: str
+        Root directory of the packed datasets. If given, the normalized
+        sets are packed there on the first call and memory-mapped from
+        then on, so that processes share the same pages.
+    num_workers: int
+        Number of worker processes reading files concurrently.
     
     Returns
     -------
-    train_set: dict
-        A dictionary with normalized training data.
-    test_set: dict
-        A dictionary with test data.
+    train_set: PackedSequences
+        A mapping with normalized training data.
+    test_set: PackedSequences
+        A mapping with test data.
     data_mean: np.array
         d-long vector with the mean of the training data.
     data_std: np.array
@@ -465,23 +1110,33 @@ def read_all_data(actions, seq_length_in, seq_length_out, data_dir):
         The dimensions that we are actually using in the model.
     """
 
+    if packed_dir:
+        packed_path = packed_data_path(packed_dir, actions, data_dir)
+        if os.path.exists(packed_path):
+            logging.info(f'Loading packed data from {packed_path}')
+            return load_packed_data(packed_path)
+
     # === Read training data ===
     logging.info(
         "Reading training data (seq_len_in: {0}, seq_len_out {1}).".format(
             seq_length_in, seq_length_out))
-    train_subject_ids = [1, 6, 7, 9, 11]
-    test_subject_ids = [5]
-    train_set, complete_train = load_data(data_dir, train_subject_ids, actions)
-    test_set, complete_test = load_data(data_dir, test_subject_ids, actions)
+    train_set, complete_train = load_data(data_dir, TRAIN_SUBJECT_IDS,
+                                          actions, cache_dir, num_workers)
+    test_set, complete_test = load_data(data_dir, TEST_SUBJECT_IDS, actions,
+                                        cache_dir, num_workers)
 
     # Compute normalization stats
     data_mean, data_std, dim_to_ignore, dim_to_use = normalization_stats(
         complete_train)
 
     # Normalize -- subtract mean, divide by stdev
-    train_set = normalize_data(train_set, data_mean, data_std, dim_to_use,
-                               actions)
-    test_set = normalize_data(test_set, data_mean, data_std, dim_to_use,
-                              actions)
+    train_set = normalize_data(train_set, data_mean, data_std, dim_to_use)
+    test_set = normalize_data(test_set, data_mean, data_std, dim_to_use)
+
+    if packed_dir:
+        logging.info(f'Packing data into {packed_path}')
+        save_packed_data(packed_path, train_set, test_set, data_mean,
+                         data_std, dim_to_ignore, dim_to_use, actions)
+        return load_packed_data(packed_path)
 
     return train_set, test_set, data_mean, data_std, dim_to_ignore, dim_to_use
@@ -0,0 +1,200 @@
+"""PyTorch datasets over the H3.6M train/test sets."""
+
+import sys
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from torch.utils.data import IterableDataset
+from torch.utils.data import get_worker_info
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.sampling import WindowSampler
+else:
+    from src.utils.sampling import WindowSampler
+
+
+def split_window(window, source_seq_len):
+    """Split a window into encoder/decoder inputs and targets.
+
+    Parameters
+    ----------
+    window: np.array
+        (source_seq_len + target_seq_len)xd float32 matrix.
+    source_seq_len: int
+        Length of the input sequence.
+
+    Returns
+    -------
+    encoder_inputs : torch.Tensor
+        The first source_seq_len - 1 frames.
+    decoder_inputs : torch.Tensor
+        The target_seq_len frames after them.
+    decoder_outputs : torch.Tensor
+        The last target_seq_len frames.
+    """
+
+    window = torch.from_numpy(window)
+
+    return (window[0:source_seq_len - 1], window[source_seq_len - 1:-1],
+            window[source_seq_len:])
+
+
+class MotionWindowDataset(Dataset):
+    """Map-style dataset over every training window of a set.
+
+    Item i is the i-th valid window, sequences in key order. Shuffling
+    it samples windows uniformly; weighting it with `window_weights`
+    reproduces `MotionPredictor.get_batch`, which picks a sequence
+    uniformly first and then a window inside it.
+    """
+
+    def __init__(self, data, source_seq_len, target_seq_len, actions=None):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        data: dict or PackedSequences
+            Mapping with k:v, k=(subject, action, subaction, 'even'),
+            v=nxd matrix with a sequence of poses.
+        source_seq_len: int
+            Length of the input sequence.
+        target_seq_len: int
+            Length of the target sequence.
+        actions: list
+            A list of the actions, in the order of the one-hot encoding
+            appended to the poses. If None, windows hold the poses only.
+        """
+
+        self.sampler = WindowSampler(data, actions)
+        self.source_seq_len = source_seq_len
+        self.total_frames = source_seq_len + target_seq_len
+
+        # Starts drawn by get_batch lie in [MIN_START, n - total_frames)
+        self.counts = np.maximum(
+            self.sampler.lengths - self.total_frames -
+            WindowSampler.MIN_START, 0)
+        self.cumulative = np.cumsum(self.counts)
+
+    def __len__(self):
+        return int(self.cumulative[-1])
+
+    def __getitem__(self, i):
+        seq_index = np.searchsorted(self.cumulative, i, side='right')
+        start = i - (self.cumulative[seq_index] - self.counts[seq_index])
+        start += WindowSampler.MIN_START
+
+        window = self.sampler.gather(np.array([seq_index]),
+                                     np.array([start]), self.total_frames)
+
+        return split_window(window[0], self.source_seq_len)
+
+    def window_weights(self):
+        """Sampling weight of every window, as drawn by get_batch.
+
+        Returns
+        -------
+        weights: torch.Tensor
+            len(self)-long vector, to use with a WeightedRandomSampler.
+        """
+
+        weights = np.repeat(1.0 / np.maximum(self.counts, 1), self.counts)
+
+        return torch.from_numpy(weights / len(self.counts))
+
+
+class SRNNSeedDataset(IterableDataset):
+    """Deterministic stream of the 8 SRNN test seeds of every action.
+
+    Yields (action, encoder_inputs, decoder_inputs, decoder_outputs) in
+    the order of `actions`; with several workers, actions are split
+    between them.
+    """
+
+    def __init__(self, data, actions, source_seq_len, target_seq_len):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        data: dict or PackedSequences
+            Mapping with the test sequences of subject 5.
+        actions: list
+            A list of strings with the actions to yield the seeds of,
+            also the order of the one-hot encoding appended to the poses.
+        source_seq_len: int
+            Length of the input sequence.
+        target_seq_len: int
+            Length of the target sequence.
+        """
+
+        self.sampler = WindowSampler(data, actions)
+        self.actions = actions
+        self.source_seq_len = source_seq_len
+        self.total_frames = source_seq_len + target_seq_len
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        actions = self.actions
+        if worker_info is not None:
+            actions = actions[worker_info.id::worker_info.num_workers]
+
+        for action in actions:
+            seq_indices, starts = self.sampler.srnn_seeds(
+                action, self.source_seq_len)
+            windows = self.sampler.gather(seq_indices, starts,
+                                          self.total_frames)
+            for window in windows:
+                yield (action, ) + split_window(window, self.source_seq_len)
+
+
+class SlidingWindowDataset(IterableDataset):
+    """Deterministic stream of all the windows of a set, every `stride`
+    frames.
+
+    Yields (encoder_inputs, decoder_inputs, decoder_outputs), sequences in
+    key order; with several workers, sequences are split between them.
+    """
+
+    def __init__(self,
+                 data,
+                 source_seq_len,
+                 target_seq_len,
+                 actions=None,
+                 stride=1):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        data: dict or PackedSequences
+            Mapping with k:v, k=(subject, action, subaction, 'even'),
+            v=nxd matrix with a sequence of poses.
+        source_seq_len: int
+            Length of the input sequence.
+        target_seq_len: int
+            Length of the target sequence.
+        actions: list
+            A list of the actions, in the order of the one-hot encoding
+            appended to the poses. If None, windows hold the poses only.
+        stride: int
+            Number of frames between the starts of consecutive windows.
+        """
+
+        self.sampler = WindowSampler(data, actions)
+        self.source_seq_len = source_seq_len
+        self.total_frames = source_seq_len + target_seq_len
+        self.stride = stride
+
+    def __iter__(self):
+        worker_info = get_worker_info()
+        seq_indices = np.arange(len(self.sampler.keys))
+        if worker_info is not None:
+            seq_indices = seq_indices[worker_info.id::worker_info.num_workers]
+
+        for seq_index in seq_indices:
+            length = self.sampler.lengths[seq_index]
+            starts = np.arange(0, length - self.total_frames + 1, self.stride)
+            windows = self.sampler.gather(np.full_like(starts, seq_index),
+                                          starts, self.total_frames)
+            for window in windows:
+                yield split_window(window, self.source_seq_len)
@@ -6,11 +6,66 @@ import numpy as np
 
 IN_COLAB = 'google.colab' in sys.modules
 if not IN_COLAB:
-    from utils.data_utils import rotmat_to_euler
-    from utils.data_utils import expmap_to_rotmat
+    from utils.data_utils import rotmat_to_euler_batch
+    from utils.data_utils import expmap_to_rotmat_batch
 else:
-    from src.utils.data_utils import rotmat_to_euler
-    from src.utils.data_utils import expmap_to_rotmat
+    from src.utils.data_utils import rotmat_to_euler_batch
+    from src.utils.data_utils import expmap_to_rotmat_batch
+
+
+def expmap_to_euler(channels):
+    """Convert exponential map channels to Euler angles, all frames at
+    once.
+
+    Parameters
+    ----------
+    channels : np.array
+        Exponential map channels of shape (..., 99).
+
+    Returns
+    -------
+    eulerchannels : np.array
+        A copy of `channels` with the angles of every joint in Euler
+        format, and the global translation and rotation (first 6 channels)
+        set to 0.
+    """
+
+    eulerchannels = np.array(channels)
+    joints = eulerchannels[..., 3:99].reshape(channels.shape[:-1] + (32, 3))
+    eulerchannels[..., 3:99] = rotmat_to_euler_batch(
+        expmap_to_rotmat_batch(joints)).reshape(channels.shape[:-1] + (96, ))
+    eulerchannels[..., 0:6] = 0
+
+    return eulerchannels
+
+
+def euler_errors(eulerchannels_pred, eulerchannels_gt):
+    """Euclidean error between Euler angles at every timestep.
+
+    Parameters
+    ----------
+    eulerchannels_pred : np.array
+        Predicted euler channels of shape (batch_size, seq_len, 99), already
+        converted with `expmap_to_euler`.
+    eulerchannels_gt : np.array
+        Ground truth euler channels of shape (batch_size, seq_len, 99)
+
+    Returns
+    -------
+    euc_error : np.array
+        (batch_size, seq_len) Euclidean errors.
+    """
+
+    # Pick only the dimensions with sufficient standard deviation along the
+    # predicted sequence of every sample. Others are ignored.
+    dims_to_use = np.std(eulerchannels_pred, 1, keepdims=True) > 1e-4
+
+    # Euclidean distance between Euler angles
+    euc_error = np.power(eulerchannels_gt - eulerchannels_pred, 2)
+    euc_error = np.sum(np.where(dims_to_use, euc_error, 0), -1)
+    euc_error = np.sqrt(euc_error)
+
+    return euc_error
 
 
 def evaluate(eulerchannels_pred, eulerchannels_gt):
@@ -19,7 +74,7 @@ def evaluate(eulerchannels_pred, eulerchannels_gt):
     Parameters
     ----------
     eulerchannels_pred : np.array
-        Predicted euler channels of shape (seq_len, 99)
+        Predicted exponential map channels of shape (seq_len, 99)
     eulerchannels_gt : np.array
         Ground truth euler channels of shape (seq_len, 99)
 
@@ -29,47 +84,39 @@ def evaluate(eulerchannels_pred, eulerchannels_gt):
         Euclidean error
     """
 
-    for j in np.arange(eulerchannels_pred.shape[0]):
-        for k in np.arange(3, 97, 3):
-            eulerchannels_pred[j, k:k + 3] = rotmat_to_euler(
-                expmap_to_rotmat(eulerchannels_pred[j, k:k + 3]))
-    eulerchannels_pred[:, 0:6] = 0
-
-    # Pick only the dimensions with sufficient standard deviation.
-    # Others are ignored.
-    idx_to_use = np.where(np.std(eulerchannels_pred, 0) > 1e-4)[0]
-
-    # Euclidean distance between Euler angles for sample i
-    euc_error = np.power(
-        eulerchannels_gt[:, idx_to_use] - eulerchannels_pred[:, idx_to_use], 2)
-    euc_error = np.sum(euc_error, 1)
-    euc_error = np.sqrt(euc_error)
-
-    return euc_error
+    return evaluate_batch(eulerchannels_pred[None],
+                          eulerchannels_gt[None],
+                          reduce=False)[0]
 
 
-def evaluate_batch(euler_pred, eulerchannels_gt):
+def evaluate_batch(euler_pred, eulerchannels_gt, reduce=True):
     """Evaluate a whole batch (all errors at each timestep).
 
     Parameters
     ----------
     euler_pred : np.array
-        Predicted euler channels of shape (batch_size, seq_len, 99)
+        Predicted exponential map channels of shape
+        (batch_size, seq_len, 99), or a list of (seq_len, 99) arrays.
     eulerchannels_gt : np.array
-        Ground truth euler channels of shape (batch_size, seq_len, 99)
+        Ground truth euler channels of shape (batch_size, seq_len, 99), or
+        a list of (seq_len, 99) arrays.
+    reduce : bool
+        Whether to average the errors over the batch.
 
     Returns
     -------
     mean_error : np.float
-        Mean error.
+        Mean error at every timestep, or the (batch_size, seq_len) errors
+        of every sample if not `reduce`.
     """
 
-    nsamples = len(euler_pred)
-    mean_errors = np.zeros((nsamples, euler_pred[0].shape[0]))
+    euler_pred = expmap_to_euler(np.asarray(euler_pred))
+    errors = euler_errors(euler_pred, np.asarray(eulerchannels_gt))
 
-    for i in np.arange(nsamples):
-        mean_errors[i, :] = evaluate(euler_pred[i], eulerchannels_gt[i])
+    if not reduce:
+        return errors
 
-    mean_error = np.mean(mean_errors, 0)
+    # Average in double precision, whatever the precision of the errors
+    mean_error = np.mean(errors, 0, dtype=np.float64)
 
     return mean_error
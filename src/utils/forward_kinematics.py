@@ -1,6 +1,7 @@
 """Script with functions to compute kinematics."""
 
 import copy
+import functools
 import sys
 
 import numpy as np
@@ -8,10 +9,14 @@ import numpy as np
 IN_COLAB = 'google.colab' in sys.modules
 if not IN_COLAB:
     from utils.data_utils import expmap_to_rotmat
+    from utils.data_utils import expmap_to_rotmat_batch
     from utils.data_utils import rotmat_to_expmap
+    from utils.data_utils import rotmat_to_expmap_batch
 else:
     from src.utils.data_utils import expmap_to_rotmat
+    from src.utils.data_utils import expmap_to_rotmat_batch
     from src.utils.data_utils import rotmat_to_expmap
+    from src.utils.data_utils import rotmat_to_expmap_batch
 
 
 def fkl(angles, parent, offset, rot_ind, expmap_ind):
@@ -78,6 +83,131 @@ def fkl(angles, parent, offset, rot_ind, expmap_ind):
     return np.reshape(xyz, [-1])
 
 
+class Skeleton(object):
+    """Kinematic tree compiled into flat arrays, for batched forward
+    kinematics.
+
+    Indices are 0-based, joints without position channels are masked, and
+    the joints are grouped by depth in the tree, so every level can be
+    processed at once after its parents.
+    """
+
+    def __init__(self, parent, offset, rot_ind, expmap_ind):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        parent : np.array
+            32-long vector with parent-child relationships in the kinematic
+            tree
+        offset: np.array
+            32x3 matrix with bone lenghts
+        rot_ind: list
+            32-long list with 1-based indices into angles, empty for the
+            joints without position channels
+        expmap_ind: list
+            32-long list with indices into expmap angles
+        """
+
+        self.njoints = len(parent)
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.offset = np.asarray(offset, dtype=np.float64).reshape(-1, 3)
+
+        # Joints without indices get 0 as position; gather any channel
+        # and mask it
+        self.has_position = np.array([len(ind) > 0 for ind in rot_ind])
+        self.position_ind = np.array(
+            [ind if ind else [1, 1, 1] for ind in rot_ind]) - 1
+        self.expmap_ind = np.array(expmap_ind, dtype=np.int64)
+
+        # Depth of every joint in the tree; parents come before children
+        self.depth = np.zeros(self.njoints, dtype=np.int64)
+        for i in range(self.njoints):
+            if self.parent[i] != -1:
+                self.depth[i] = self.depth[self.parent[i]] + 1
+        self.levels = [
+            np.where(self.depth == level)[0]
+            for level in range(self.depth.max() + 1)
+        ]
+
+        # Shared by every caller of h36m_skeleton, so make it read-only
+        for array in [
+                self.parent, self.offset, self.has_position,
+                self.position_ind, self.expmap_ind, self.depth
+        ] + self.levels:
+            array.setflags(write=False)
+
+
+@functools.lru_cache(maxsize=None)
+def h36m_skeleton():
+    """The H3.6M kinematic tree, compiled once.
+
+    Returns
+    -------
+    skeleton: Skeleton
+        The compiled tree of `kinematic_tree_variables`.
+    """
+
+    return Skeleton(*kinematic_tree_variables())
+
+
+def fkl_batch(angles, skeleton=None):
+    """Convert joint angles and bone lenghts into the 3d points of a person,
+    for many poses at once.
+
+    Batched version of `fkl`: the rotations of all the joints of all the
+    poses are computed in one call, and the kinematic tree is walked level
+    by level, every level updating its joints in all the poses together.
+
+    Parameters
+    ----------
+    angles : np.array
+        (..., 99) array with 3d position and 3d joint angles in expmap
+        format, e.g. a n-by-99 sequence or a batch of them.
+    skeleton : Skeleton
+        The kinematic tree; the H3.6M one by default.
+
+    Returns
+    -------
+    xyz: np.array
+        (..., 96) array with the 32 3d points of every pose, in the same
+        format as `fkl`.
+    """
+
+    assert angles.shape[-1] == 99
+
+    if skeleton is None:
+        skeleton = h36m_skeleton()
+
+    batch_shape = angles.shape[:-1]
+    angles = angles.reshape(-1, 99)
+
+    positions = angles[:, skeleton.position_ind] * \
+        skeleton.has_position[:, None]
+    rotations = expmap_to_rotmat_batch(angles[:, skeleton.expmap_ind])
+
+    xyz = np.zeros((angles.shape[0], skeleton.njoints, 3))
+    global_rotations = np.zeros_like(rotations)
+
+    for level, joints in enumerate(skeleton.levels):
+        local_xyz = skeleton.offset[joints] + positions[:, joints]
+
+        if level == 0:  # Root node
+            xyz[:, joints] = local_xyz
+            global_rotations[:, joints] = rotations[:, joints]
+        else:
+            parents = skeleton.parent[joints]
+            xyz[:, joints] = np.einsum(
+                'njk,njkl->njl', local_xyz,
+                global_rotations[:, parents]) + xyz[:, parents]
+            global_rotations[:, joints] = np.matmul(
+                rotations[:, joints], global_rotations[:, parents])
+
+    xyz = xyz[:, :, [0, 2, 1]]
+
+    return xyz.reshape(batch_shape + (skeleton.njoints * 3, ))
+
+
 def revert_coordinate_space(channels, R0, T0):
     """Bring a series of poses to a canonical form so they are
     facing the camera when they start.
@@ -123,6 +253,61 @@ def revert_coordinate_space(channels, R0, T0):
     return channels_rec
 
 
+def revert_coordinate_space_batch(channels, R0, T0):
+    """Bring series of poses to a canonical form so they are facing the
+    camera when they start.
+
+    Batched version of `revert_coordinate_space`: the root rotations of
+    all the frames are converted at once, and accumulated with a parallel
+    prefix product of log2(n) batched matmuls instead of a loop over the
+    frames.
+
+    Parameters
+    ----------
+    channels : np.array
+        (..., n, 99) array of sequences of poses
+    R0: np.array
+        3x3 rotation for the first frame, or (..., 3, 3) one per sequence
+    T0: np.array
+        3-long position for the first frame, or (..., 3) one per sequence
+
+    Returns
+    -------
+    channels_rec: np.array
+        The passed poses, but the first has T0 and R0, and the
+        rest of the sequence is modified accordingly.
+    """
+
+    n = channels.shape[-2]
+
+    channels_rec = np.array(channels)
+    R0 = np.asarray(R0)[..., None, :, :]
+    T0 = np.asarray(T0)[..., None, :]
+    rootRotInd = np.arange(3, 6)
+
+    # Inclusive scan: after it, R[i] = R_diff[i] ... R_diff[0]
+    R = expmap_to_rotmat_batch(channels[..., rootRotInd])
+    step = 1
+    while step < n:
+        R_shifted = R[..., :-step, :, :]
+        R = np.concatenate(
+            [R[..., :step, :, :],
+             np.matmul(R[..., step:, :, :], R_shifted)], axis=-3)
+        step *= 2
+    R = np.matmul(R, R0)
+
+    channels_rec[..., rootRotInd] = rotmat_to_expmap_batch(R)
+
+    # Every translation is rotated by the rotation of the previous frame
+    R_prev = np.concatenate(
+        [np.broadcast_to(R0, R.shape[:-3] + (1, 3, 3)), R[..., :-1, :, :]],
+        axis=-3)
+    T_diff = np.einsum('...ji,...j->...i', R_prev, channels[..., :3])
+    channels_rec[..., :3] = T0 + np.cumsum(T_diff, axis=-2)
+
+    return channels_rec
+
+
 def kinematic_tree_variables():
     """We define some variables that are useful to run the kinematic tree
 
@@ -0,0 +1,141 @@
+"""Packed, memory-mappable storage for sets of pose sequences."""
+
+from collections.abc import Mapping
+import json
+import os
+
+import numpy as np
+
+
+class PackedSequences(Mapping):
+    """Read-only mapping from sequence keys to views of a packed array.
+
+    All the frames of all the sequences live in one contiguous 2D array;
+    an index maps every (subject, action, subaction, 'even') key to the
+    rows of its sequence. Indexing returns a view, never a copy, so the
+    array can be memory-mapped from disk and shared between processes.
+    """
+
+    FRAMES_FNAME = 'frames.npy'
+    INDEX_FNAME = 'index.json'
+
+    def __init__(self, frames, index):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        frames: np.array
+            nxd matrix with the frames of all the sequences.
+        index: dict
+            Dictionary with k:v, k=(subject, action, subaction, 'even'),
+            v=(start, stop) rows of the sequence in `frames`.
+        """
+
+        self.frames = frames
+        self.index = index
+
+    def __getitem__(self, key):
+        start, stop = self.index[key]
+        return self.frames[start:stop]
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def empty(cls, lengths, dim, dtype=np.float32):
+        """Allocate a packed set to be filled in place.
+
+        Parameters
+        ----------
+        lengths: dict
+            Dictionary with k:v, k=sequence key, v=number of frames.
+        dim: int
+            Number of columns of every frame.
+        dtype: np.dtype
+            Type of the packed array.
+
+        Returns
+        -------
+        packed: PackedSequences
+            Packed set with uninitialized frames.
+        """
+
+        index = {}
+        start = 0
+        for key, length in lengths.items():
+            index[key] = (start, start + length)
+            start += length
+
+        return cls(np.empty((start, dim), dtype=dtype), index)
+
+    @classmethod
+    def from_dict(cls, data, dtype=np.float32):
+        """Pack a dictionary of sequences.
+
+        Parameters
+        ----------
+        data: dict
+            Dictionary with k:v, k=sequence key, v=nxd matrix.
+        dtype: np.dtype
+            Type of the packed array.
+
+        Returns
+        -------
+        packed: PackedSequences
+            The same sequences in packed form.
+        """
+
+        lengths = {key: value.shape[0] for key, value in data.items()}
+        dim = next(iter(data.values())).shape[1]
+        packed = cls.empty(lengths, dim, dtype)
+        for key, value in data.items():
+            packed[key][:] = value
+
+        return packed
+
+    def save(self, path):
+        """Write the packed set to a directory.
+
+        Parameters
+        ----------
+        path: str
+            Directory where the frames and the index are written.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, self.FRAMES_FNAME),
+                np.ascontiguousarray(self.frames))
+        index = [list(key) + list(rows) for key, rows in self.index.items()]
+        with open(os.path.join(path, self.INDEX_FNAME), 'w') as f:
+            json.dump(index, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a packed set written by `save`.
+
+        Parameters
+        ----------
+        path: str
+            Directory with the frames and the index.
+        mmap: bool
+            Whether to memory-map the frames (read-only) instead of
+            reading them into memory.
+
+        Returns
+        -------
+        packed: PackedSequences
+            The loaded packed set.
+        """
+
+        frames = np.load(os.path.join(path, cls.FRAMES_FNAME),
+                         mmap_mode='r' if mmap else None)
+        with open(os.path.join(path, cls.INDEX_FNAME)) as f:
+            index = {
+                tuple(entry[:-2]): (entry[-2], entry[-1])
+                for entry in json.load(f)
+            }
+
+        return cls(frames, index)
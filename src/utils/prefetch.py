@@ -0,0 +1,98 @@
+"""Background prefetching of training batches."""
+
+import queue
+import threading
+
+import numpy as np
+
+
+class BatchPrefetcher(object):
+    """Iterator over batches produced ahead of time by worker threads.
+
+    Every worker calls `make_batch` with its own random generator and puts
+    the result in a bounded queue, so batch preparation overlaps with the
+    optimizer step and never runs more than `queue_depth` batches ahead.
+    The heavy parts of batch construction (numpy gathers, tensor copies)
+    release the GIL, so threads are enough to overlap them with compute.
+    """
+
+    def __init__(self, make_batch, queue_depth=4, num_workers=1, seed=None):
+        """Constructor of the class. Starts the workers.
+
+        Parameters
+        ----------
+        make_batch: callable
+            Function that takes a np.random.RandomState and returns a
+            batch.
+        queue_depth: int
+            Maximum number of batches waiting to be consumed.
+        num_workers: int
+            Number of worker threads.
+        seed: int
+            Seed of the first worker; worker i is seeded with seed + i.
+            Drawn from the global numpy generator if None, so runs are
+            reproducible under np.random.seed with a single worker.
+        """
+
+        if seed is None:
+            seed = np.random.randint(2**31 - num_workers)
+
+        self.make_batch = make_batch
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.stop_event = threading.Event()
+        self.workers = [
+            threading.Thread(target=self._work,
+                             args=(np.random.RandomState(seed + i), ),
+                             daemon=True) for i in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def _work(self, rng):
+        """Loop of a worker thread."""
+
+        while not self.stop_event.is_set():
+            try:
+                item = (self.make_batch(rng), None)
+            except Exception as e:  # pylint: disable=broad-except
+                item = (None, e)
+
+            # Wait for room in the queue, but keep checking for close()
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            if item[1] is not None:
+                return
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        batch, error = self.queue.get()
+        if error is not None:
+            self.close()
+            raise error
+        return batch
+
+    def close(self):
+        """Stop the workers and drop the pending batches."""
+
+        self.stop_event.set()
+        for worker in self.workers:
+            # Unblock workers waiting on a full queue
+            while worker.is_alive():
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                worker.join(timeout=0.1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
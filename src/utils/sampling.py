@@ -0,0 +1,203 @@
+"""Vectorized sampling of training windows from sets of sequences."""
+
+import sys
+
+import numpy as np
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.packed_data import PackedSequences
+else:
+    from src.utils.packed_data import PackedSequences
+
+
+def find_indices_srnn(data, action):
+    """Find the same action indices as in SRNN.
+
+    See https://github.com/asheshjain399/RNNexp/blob/master/structural_rnn/CRFProblems/H3.6m/processdata.py#L325
+
+    Parameters
+    ----------
+    data:
+        A mapping of sequences.
+    action:
+        The action.
+
+    Returns
+    -------
+    idx : list
+        A list of indices where the action is found.
+    """
+
+    # Used a fixed dummy seed, following
+    # https://github.com/asheshjain399/RNNexp/blob/srnn/structural_rnn/forecastTrajectories.py#L29
+    SEED = 1234567890
+    rng = np.random.RandomState(SEED)
+
+    subject = 5
+    subaction1 = 1
+    subaction2 = 2
+
+    T1 = data[(subject, action, subaction1, 'even')].shape[0]
+    T2 = data[(subject, action, subaction2, 'even')].shape[0]
+    prefix, suffix = 50, 100
+
+    # Test is performed always on subject 5
+    # Select 8 random sub-sequences (by specifying their indices)
+    idx = []
+    idx.append(rng.randint(16, T1 - prefix - suffix))
+    idx.append(rng.randint(16, T2 - prefix - suffix))
+    idx.append(rng.randint(16, T1 - prefix - suffix))
+    idx.append(rng.randint(16, T2 - prefix - suffix))
+    idx.append(rng.randint(16, T1 - prefix - suffix))
+    idx.append(rng.randint(16, T2 - prefix - suffix))
+    idx.append(rng.randint(16, T1 - prefix - suffix))
+    idx.append(rng.randint(16, T2 - prefix - suffix))
+
+    return idx
+
+
+class WindowSampler(object):
+    """Index of the sequences of a dataset, to draw and gather windows.
+
+    The keys and lengths of all the sequences are computed once. A batch
+    of windows is then drawn with one call to the random generator and
+    gathered with fancy indexing: a single gather for packed data, one per
+    distinct sequence in the batch otherwise. Sequences hold poses only;
+    when the actions are given, the one-hot encoding of the action of
+    every window is appended while gathering.
+    """
+
+    # Windows never start in the first frames of a sequence, as in SRNN
+    MIN_START = 16
+
+    def __init__(self, data, actions=None):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        data: dict or PackedSequences
+            Mapping with k:v, k=(subject, action, subaction, 'even'),
+            v=nxd matrix with a sequence of poses.
+        actions: list
+            A list of strings with the encoded actions, in the order of
+            the one-hot encoding. If None, windows hold the poses only.
+        """
+
+        self.data = data
+        self.keys = list(data.keys())
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.lengths = np.array([data[key].shape[0] for key in self.keys])
+        self.dim = data[self.keys[0]].shape[1]
+
+        self.n_actions = 0
+        if actions is not None:
+            self.n_actions = len(actions)
+            self.action_ids = np.array(
+                [actions.index(key[1]) for key in self.keys])
+
+        self.packed = isinstance(data, PackedSequences)
+        if self.packed:
+            self.offsets = np.array(
+                [data.index[key][0] for key in self.keys])
+
+    def sample(self, batch_size, total_frames, rng=np.random):
+        """Draw random windows, picking a sequence first and then a start.
+
+        Parameters
+        ----------
+        batch_size: int
+            Number of windows to draw.
+        total_frames: int
+            Length of every window.
+        rng: np.random.RandomState
+            Random generator to draw from; the global one by default.
+
+        Returns
+        -------
+        seq_indices: np.array
+            batch_size-long vector with the index of the sequence of every
+            window.
+        starts: np.array
+            batch_size-long vector with the first frame of every window.
+        """
+
+        seq_indices = rng.choice(len(self.keys), batch_size)
+        starts = rng.randint(self.MIN_START,
+                             self.lengths[seq_indices] - total_frames)
+
+        return seq_indices, starts
+
+    def srnn_seeds(self, action, source_seq_len):
+        """Windows of the 8 SRNN test seeds of an action.
+
+        Parameters
+        ----------
+        action: str
+            The action to get the seeds of, e.g. 'walking'.
+        source_seq_len: int
+            Length of the input sequence; the windows start that many
+            frames before the SRNN prediction point.
+
+        Returns
+        -------
+        seq_indices: np.array
+            8-long vector with the index of the sequence of every window.
+        starts: np.array
+            8-long vector with the first frame of every window.
+        """
+
+        batch_size = 8  # we always evaluate 8 sequences
+        subject = 5  # we always evaluate on subject 5
+
+        frames = find_indices_srnn(self.data, action)
+
+        seq_indices = np.array([
+            self.key_index[(subject, action, (i % 2) + 1, 'even')]
+            for i in range(batch_size)
+        ])
+        starts = np.array(frames) + 50 - source_seq_len
+
+        return seq_indices, starts
+
+    def gather(self, seq_indices, starts, total_frames):
+        """Copy windows into one float32 array.
+
+        Parameters
+        ----------
+        seq_indices: np.array
+            Index of the sequence of every window.
+        starts: np.array
+            First frame of every window.
+        total_frames: int
+            Length of every window.
+
+        Returns
+        -------
+        windows: np.array
+            (batch_size, total_frames, d + n_actions) float32 array.
+        """
+
+        frame_range = np.arange(total_frames)
+        batch_size = len(seq_indices)
+
+        windows = np.zeros(
+            (batch_size, total_frames, self.dim + self.n_actions),
+            dtype=np.float32)
+
+        if self.packed:
+            rows = (self.offsets[seq_indices] + starts)[:, None] + frame_range
+            windows[:, :, :self.dim] = self.data.frames[rows]
+        else:
+            for seq_index in np.unique(seq_indices):
+                mask = seq_indices == seq_index
+                rows = starts[mask][:, None] + frame_range
+                windows[mask, :, :self.dim] = \
+                    self.data[self.keys[seq_index]][rows]
+
+        if self.n_actions > 0:
+            # Materialize the one-hot encoding of the actions
+            one_hot = self.dim + self.action_ids[seq_indices]
+            windows[np.arange(batch_size), :, one_hot] = 1
+
+        return windows
@@ -0,0 +1,165 @@
+"""Evaluation of batches of predictions on torch tensors.
+
+Torch version of `evaluation`, to compute the Euler angle error on the
+device of the model, e.g. during training.
+"""
+
+import sys
+
+import torch
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.torch_rotations import expmap_to_rotmat
+    from utils.torch_rotations import rotmat_to_euler
+else:
+    from src.utils.torch_rotations import expmap_to_rotmat
+    from src.utils.torch_rotations import rotmat_to_euler
+
+
+def unnormalize(poses, data_mean, data_std, dim_to_use):
+    """Denormalize the outputs of the model back to the 99 channels.
+
+    Parameters
+    ----------
+    poses: torch.Tensor
+        (..., d) normalized poses; trailing one-hot channels are ignored.
+    data_mean: torch.Tensor
+        99-long vector with the mean of the training data.
+    data_std: torch.Tensor
+        99-long vector with the standard deviation of the training data.
+    dim_to_use: torch.Tensor
+        Indices of the channels used by the model.
+
+    Returns
+    -------
+    channels: torch.Tensor
+        (..., 99) exponential map channels; the unused ones hold the mean.
+    """
+
+    channels = data_mean.expand(poses.shape[:-1] + data_mean.shape).clone()
+    channels[..., dim_to_use] = poses[..., :len(dim_to_use)] * \
+        data_std[dim_to_use] + data_mean[dim_to_use]
+
+    return channels
+
+
+def expmap_to_euler(channels):
+    """Convert exponential map channels to Euler angles.
+
+    Parameters
+    ----------
+    channels : torch.Tensor
+        Exponential map channels of shape (..., 99).
+
+    Returns
+    -------
+    eulerchannels : torch.Tensor
+        The angles of every joint in Euler format, with the global
+        translation and rotation (first 6 channels) set to 0.
+    """
+
+    joints = channels[..., 3:99].reshape(channels.shape[:-1] + (32, 3))
+    euler = rotmat_to_euler(expmap_to_rotmat(joints)).flatten(-2)
+
+    return torch.cat([torch.zeros_like(channels[..., :6]), euler[..., 3:]],
+                     dim=-1)
+
+
+def euler_errors(eulerchannels_pred, eulerchannels_gt):
+    """Euclidean error between Euler angles at every timestep.
+
+    Parameters
+    ----------
+    eulerchannels_pred : torch.Tensor
+        Predicted euler channels of shape (batch_size, seq_len, 99).
+    eulerchannels_gt : torch.Tensor
+        Ground truth euler channels of shape (batch_size, seq_len, 99).
+
+    Returns
+    -------
+    euc_error : torch.Tensor
+        (batch_size, seq_len) Euclidean errors.
+    """
+
+    # Pick only the dimensions with sufficient standard deviation along the
+    # predicted sequence of every sample. Others are ignored.
+    dims_to_use = torch.std(eulerchannels_pred, 1, unbiased=False,
+                            keepdim=True) > 1e-4
+
+    euc_error = (eulerchannels_gt - eulerchannels_pred)**2
+    euc_error = torch.where(dims_to_use, euc_error,
+                            torch.zeros_like(euc_error))
+
+    return torch.sqrt(euc_error.sum(-1))
+
+
+def evaluate_batch(preds, targets, data_mean, data_std, dim_to_use):
+    """Mean Euler angle error at each timestep of a batch of normalized
+    predictions, as in the SRNN benchmark.
+
+    Parameters
+    ----------
+    preds : torch.Tensor
+        (batch_size, seq_len, d) outputs of the model.
+    targets : torch.Tensor
+        (batch_size, seq_len, d) normalized ground truth.
+    data_mean: torch.Tensor
+        99-long vector with the mean of the training data.
+    data_std: torch.Tensor
+        99-long vector with the standard deviation of the training data.
+    dim_to_use: torch.Tensor
+        Indices of the channels used by the model.
+
+    Returns
+    -------
+    mean_error : torch.Tensor
+        seq_len-long vector with the mean error at every timestep.
+    """
+
+    euler_pred = expmap_to_euler(
+        unnormalize(preds, data_mean, data_std, dim_to_use))
+    euler_gt = expmap_to_euler(
+        unnormalize(targets, data_mean, data_std, dim_to_use))
+
+    return euler_errors(euler_pred, euler_gt).mean(0)
+
+
+def mpjpe(preds, targets, data_mean, data_std, dim_to_use, fk):
+    """Mean per joint position error of a batch of normalized predictions.
+
+    Poses are denormalized and their global translation and rotation
+    (first 6 channels) set to 0, so joints are compared relative to the
+    root.
+
+    Parameters
+    ----------
+    preds : torch.Tensor
+        (batch_size, seq_len, d) outputs of the model.
+    targets : torch.Tensor
+        (batch_size, seq_len, d) normalized ground truth.
+    data_mean: torch.Tensor
+        99-long vector with the mean of the training data.
+    data_std: torch.Tensor
+        99-long vector with the standard deviation of the training data.
+    dim_to_use: torch.Tensor
+        Indices of the channels used by the model.
+    fk: ForwardKinematics
+        Forward kinematics module, on the device of the tensors.
+
+    Returns
+    -------
+    errors : torch.Tensor
+        (batch_size, seq_len) mean distance between the predicted and
+        ground truth joints, in millimeters. Differentiable.
+    """
+
+    xyz = []
+    for poses in [preds, targets]:
+        channels = unnormalize(poses, data_mean, data_std, dim_to_use)
+        channels = torch.cat(
+            [torch.zeros_like(channels[..., :6]), channels[..., 6:]], dim=-1)
+        xyz.append(fk(channels).unflatten(-1, (-1, 3)))
+
+    # The norm has a zero gradient where joints coincide, e.g. at the root
+    return torch.linalg.vector_norm(xyz[0] - xyz[1], dim=-1).mean(-1)
@@ -0,0 +1,110 @@
+"""Differentiable forward kinematics on torch tensors."""
+
+import sys
+
+import numpy as np
+import torch
+from torch import nn
+
+IN_COLAB = 'google.colab' in sys.modules
+if not IN_COLAB:
+    from utils.forward_kinematics import h36m_skeleton
+    from utils.torch_rotations import expmap_to_rotmat
+else:
+    from src.utils.forward_kinematics import h36m_skeleton
+    from src.utils.torch_rotations import expmap_to_rotmat
+
+
+class ForwardKinematics(nn.Module):
+    """Batched forward kinematics, the torch version of `fkl_batch`.
+
+    The compiled skeleton is stored in buffers, so the module follows the
+    device of `.to()`. Gradients flow from the 3d points back to the angles.
+    """
+
+    def __init__(self, skeleton=None):
+        """Constructor of the class.
+
+        Parameters
+        ----------
+        skeleton : Skeleton
+            The kinematic tree; the H3.6M one by default.
+        """
+
+        super(ForwardKinematics, self).__init__()
+
+        if skeleton is None:
+            skeleton = h36m_skeleton()
+
+        self.njoints = skeleton.njoints
+        self.level_sizes = [len(joints) for joints in skeleton.levels]
+        # Every parent is on the level above its children, so each level
+        # only reads the level before it, at these indices
+        parent_ind = [np.zeros(self.level_sizes[0], dtype=np.int64)] + [
+            np.searchsorted(above, skeleton.parent[joints])
+            for above, joints in zip(skeleton.levels, skeleton.levels[1:])
+        ]
+        joints = np.concatenate(skeleton.levels)
+
+        # Kept in double precision, and cast to the dtype of the angles
+        self.register_buffer('offset', torch.tensor(skeleton.offset))
+        self.register_buffer('has_position',
+                             torch.tensor(skeleton.has_position))
+        self.register_buffer('position_ind',
+                             torch.tensor(skeleton.position_ind))
+        self.register_buffer('expmap_ind', torch.tensor(skeleton.expmap_ind))
+        self.register_buffer('level_joints', torch.from_numpy(joints))
+        self.register_buffer('level_parents',
+                             torch.from_numpy(np.concatenate(parent_ind)))
+        # Position of every joint in the concatenated levels
+        self.register_buffer('joint_order',
+                             torch.from_numpy(np.argsort(joints)))
+
+    def forward(self, angles):
+        """Compute the 3d points of the joints.
+
+        Parameters
+        ----------
+        angles : torch.Tensor
+            (..., 99) tensor with 3d position and 3d joint angles in expmap
+            format.
+
+        Returns
+        -------
+        xyz : torch.Tensor
+            (..., 96) tensor with the 32 3d points of every pose, in the
+            same format as `fkl`.
+        """
+
+        batch_shape = angles.shape[:-1]
+        angles = angles.reshape(-1, angles.shape[-1])
+
+        positions = angles[:, self.position_ind] * \
+            self.has_position[:, None]
+        rotations = expmap_to_rotmat(angles[:, self.expmap_ind])
+        local_xyz = self.offset.to(angles.dtype) + positions
+
+        # The joints are put in the order of the levels once, and the points
+        # of every level gathered at the end, as indexing or writing a
+        # tensor of all the joints at every level copies it each time
+        level_xyz = []
+        levels = zip(
+            torch.split(local_xyz[:, self.level_joints], self.level_sizes, 1),
+            torch.split(rotations[:, self.level_joints], self.level_sizes, 1),
+            torch.split(self.level_parents, self.level_sizes))
+        for level, (offsets, local_rotations, parents) in enumerate(levels):
+            if level == 0:  # Root node
+                xyz = offsets
+                global_rotations = local_rotations
+            else:
+                parent_rotations = global_rotations[:, parents]
+                xyz = torch.einsum('njk,njkl->njl', offsets,
+                                   parent_rotations) + xyz[:, parents]
+                global_rotations = torch.matmul(local_rotations,
+                                                parent_rotations)
+            level_xyz.append(xyz)
+
+        xyz = torch.cat(level_xyz, 1)[:, self.joint_order]
+        xyz = xyz[:, :, [0, 2, 1]]
+
+        return xyz.reshape(batch_shape + (self.njoints * 3, ))
@@ -0,0 +1,79 @@
+"""Batched rotation conversions on torch tensors.
+
+Torch versions of the conversions in `data_utils`, to run on the device
+of the model. All the functions take tensors with any number of leading
+batch dimensions.
+"""
+
+import math
+
+import torch
+
+EPS = 1.1920929e-07  # np.finfo(np.float32).eps, as in data_utils
+
+
+def expmap_to_rotmat(r):
+    """Converts exponential maps to rotation matrices (Rodrigues' formula).
+
+    Parameters
+    ----------
+    r: torch.Tensor
+        (..., 3) exponential maps.
+
+    Returns
+    -------
+    R: torch.Tensor
+        (..., 3, 3) rotation matrices.
+    """
+
+    theta = torch.linalg.norm(r, dim=-1)
+    r0 = r / (theta + EPS).unsqueeze(-1)
+    x, y, z = r0.unbind(-1)
+    zero = torch.zeros_like(x)
+
+    # Cross-product (skew-symmetric) matrices of the unit axes
+    r0x = torch.stack([zero, -z, y, z, zero, -x, -y, x, zero],
+                      dim=-1).reshape(r.shape[:-1] + (3, 3))
+
+    sin_theta = torch.sin(theta)[..., None, None]
+    cos_theta = torch.cos(theta)[..., None, None]
+    eye = torch.eye(3, dtype=r.dtype, device=r.device)
+
+    return eye + sin_theta * r0x + (1 - cos_theta) * torch.matmul(r0x, r0x)
+
+
+def rotmat_to_euler(R):
+    """Converts rotation matrices to Euler angles.
+
+    The gimbal lock case is handled with a mask, as in
+    `data_utils.rotmat_to_euler_batch`.
+
+    Parameters
+    ----------
+    R: torch.Tensor
+        (..., 3, 3) rotation matrices.
+
+    Returns
+    -------
+    eul: torch.Tensor
+        (..., 3) Euler angle representations of R.
+    """
+
+    R02 = R[..., 0, 2]
+    special = (R02 == 1) | (R02 == -1)
+
+    # General case. Rounding can push R02 just out of [-1, 1] in single
+    # precision, so clamp it before the arcsin
+    E2 = -torch.asin(R02.clamp(-1, 1))
+    cos_E2 = torch.cos(E2)
+    E1 = torch.atan2(R[..., 1, 2] / cos_E2, R[..., 2, 2] / cos_E2)
+    E3 = torch.atan2(R[..., 0, 1] / cos_E2, R[..., 0, 0] / cos_E2)
+
+    # Special case, with E3 set arbitrarily to 0
+    dlta = torch.atan2(R[..., 0, 1], R02)
+    half_pi = torch.full_like(R02, math.pi / 2)
+    E1 = torch.where(special, dlta, E1)
+    E2 = torch.where(special, torch.where(R02 == -1, half_pi, -half_pi), E2)
+    E3 = torch.where(special, torch.zeros_like(E3), E3)
+
+    return torch.stack([E1, E2, E3], dim=-1)